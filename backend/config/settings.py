@@ -35,10 +35,12 @@ class Settings(BaseSettings):
     similarity_threshold: float = 0.7
     max_suggestions: int = 10
     context_window_size: int = 512
+    citation_hash_algorithm: str = "blake2b"  # "md5" to match citations hashed before the switch
     
     # Search settings
     search_timeout: int = 30
     max_search_results: int = 50
+    quantize_embeddings: bool = False  # int8 embedding matrix (needs simsimd): 4x less memory, ~0.01 cosine error
     
     # WebSocket settings
     websocket_timeout: int = 60
@@ -46,6 +48,7 @@ class Settings(BaseSettings):
     # Security settings
     secret_key: str = "your-secret-key-change-in-production"
     access_token_expire_minutes: int = 30
+    bcrypt_target_ms: int = 250  # bcrypt cost is calibrated at startup to hash within this
     
     # Monitoring
     enable_metrics: bool = True
@@ -0,0 +1,76 @@
+"""
+SQLite connection helpers shared by the database managers
+"""
+import aiosqlite
+import asyncio
+import sqlite3
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# Applied to every connection right after it is opened. WAL lets readers run
+# alongside the writer, NORMAL sync is durable under WAL without an fsync per
+# commit, and the cache/mmap sizes keep the hot pages of metadata.db in memory.
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA cache_size = -64000;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA mmap_size = 268435456;
+    PRAGMA busy_timeout = 10000;
+"""
+
+# Size of sqlite3's per-connection prepared statement cache (LRU keyed by SQL
+# text). Reused connections skip re-parsing the hot log/query statements.
+STATEMENT_CACHE_SIZE = 256
+
+# One lock per shared connection, held for each operation on it. A transaction
+# lives on the connection, not the manager, so every manager using the handle
+# has to wait on the same lock or they commit/roll back each other's work.
+_shared_locks: "weakref.WeakKeyDictionary[aiosqlite.Connection, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply the standard pragmas to a blocking sqlite3 connection"""
+    conn.executescript(SQLITE_PRAGMAS)
+    return conn
+
+@asynccontextmanager
+async def connect(db_path: str):
+    """Open an aiosqlite connection with the standard pragmas applied"""
+    async with aiosqlite.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE) as db:
+        await db.executescript(SQLITE_PRAGMAS)
+        yield db
+
+async def open_shared(db_path: str) -> aiosqlite.Connection:
+    """Open a long-lived connection that several managers can share
+    
+    The caller owns the connection and must close it.
+    """
+    db = await aiosqlite.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE)
+    await db.executescript(SQLITE_PRAGMAS)
+    _shared_locks[db] = asyncio.Lock()
+    return db
+
+@asynccontextmanager
+async def _borrow(db: aiosqlite.Connection):
+    """Use a shared connection without closing it afterwards
+    
+    Reads and writes alike hold the connection's lock for the whole scope, so
+    no other manager's statements or commit can land in the middle.
+    """
+    lock = _shared_locks.get(db)
+    if lock is None:
+        lock = _shared_locks.setdefault(db, asyncio.Lock())
+    async with lock:
+        try:
+            yield db
+        except Exception:
+            # Don't leave a half-finished transaction on the shared handle
+            await db.rollback()
+            raise
+
+def open_connection(db_path: str, shared: Optional[aiosqlite.Connection] = None):
+    """Context manager over the shared connection if given, else a fresh one"""
+    if shared is not None:
+        return _borrow(shared)
+    return connect(db_path)
@@ -4,22 +4,68 @@ Database manager for SQLite operations
 import aiosqlite
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 import json
+import numpy as np
 
 from models.schemas import DocumentMetadata, DocumentStatus
+from database.connection import open_connection
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+CITATION_COLUMNS = (
+    'id', 'document_id', 'document_title', 'page_number', 'paragraph_number',
+    'section_title', 'content_hash', 'direct_url', 'created_at', 'updated_at'
+)
+
+# Upsert keeps the original created_at of an existing citation
+CITATION_UPSERT_SQL = """
+    INSERT INTO citations ({columns})
+    VALUES ({placeholders})
+    ON CONFLICT(id) DO UPDATE SET {updates}
+""".format(
+    columns=', '.join(CITATION_COLUMNS),
+    placeholders=', '.join('?' for _ in CITATION_COLUMNS),
+    updates=', '.join(
+        f"{column} = excluded.{column}"
+        for column in CITATION_COLUMNS
+        if column not in ('id', 'created_at')
+    )
+)
+
+def _citation_params(citation_data: Dict[str, Any]) -> tuple:
+    return tuple(citation_data.get(column) for column in CITATION_COLUMNS)
+
+# Columns get_citations can filter on, in the order they appear in the SQL
+CITATION_FILTERS = ('document_id', 'page_number', 'paragraph_number', 'content_hash')
+
+@lru_cache(maxsize=None)
+def _citation_select_sql(filter_columns: Tuple[str, ...]) -> str:
+    """SELECT text for a set of filter columns
+    
+    Built once per combination so the same filters always produce identical
+    SQL and hit the connection's prepared statement cache.
+    """
+    return f"SELECT {', '.join(CITATION_COLUMNS)} FROM citations WHERE 1=1" + ''.join(
+        f" AND {column} = ?" for column in filter_columns
+    )
+
 class DatabaseManager:
     """SQLite database manager for metadata and analytics"""
     
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, conn: Optional[aiosqlite.Connection] = None):
         self.db_path = db_url.replace('sqlite:///', '')
         self.db_lock = asyncio.Lock()
+        # Optional pre-opened connection shared with other managers
+        self._conn = conn
+        
+    def _connect(self):
+        """Connection scope for one operation"""
+        return open_connection(self.db_path, self._conn)
         
     async def initialize(self):
         """Initialize database schema"""
@@ -28,7 +74,7 @@ class DatabaseManager:
         db_path.parent.mkdir(parents=True, exist_ok=True)
         
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 # Enable foreign keys
                 await db.execute("PRAGMA foreign_keys = ON")
                 
@@ -111,7 +157,7 @@ class DatabaseManager:
     async def health_check(self) -> bool:
         """Check database connectivity"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("SELECT 1")
             return True
         except Exception as e:
@@ -121,7 +167,7 @@ class DatabaseManager:
     async def save_document_metadata(self, metadata: DocumentMetadata, user_id: Optional[str] = None):
         """Save document metadata to database"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 # Check if user_id column exists
                 async with db.execute("PRAGMA table_info(documents)") as cursor:
                     columns = await cursor.fetchall()
@@ -178,7 +224,7 @@ class DatabaseManager:
     async def update_document_status(self, document_id: str, status: str):
         """Update document processing status"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 processed_date = datetime.now().isoformat() if status == 'processed' else None
                 await db.execute("""
                     UPDATE documents 
@@ -209,7 +255,7 @@ class DatabaseManager:
         query += " ORDER BY upload_date DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
                 
@@ -238,13 +284,13 @@ class DatabaseManager:
     async def delete_document(self, document_id: str):
         """Delete document metadata"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("DELETE FROM documents WHERE id = ?", (document_id,))
                 await db.commit()
                 
     async def document_exists(self, document_id: str) -> bool:
         """Check if document exists"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute(
                 "SELECT COUNT(*) FROM documents WHERE id = ?", 
                 (document_id,)
@@ -252,6 +298,20 @@ class DatabaseManager:
                 row = await cursor.fetchone()
                 return row[0] > 0
                 
+    async def existing_document_ids(self, document_ids: List[str]) -> set:
+        """Return the subset of document_ids that exist, in one query"""
+        ids = list(set(document_ids))
+        if not ids:
+            return set()
+        
+        placeholders = ', '.join('?' for _ in ids)
+        async with self._connect() as db:
+            async with db.execute(
+                f"SELECT id FROM documents WHERE id IN ({placeholders})",
+                ids
+            ) as cursor:
+                return {row[0] for row in await cursor.fetchall()}
+                
     async def log_search_analytics(
         self,
         query_text: str,
@@ -264,7 +324,7 @@ class DatabaseManager:
     ):
         """Log search analytics"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 # Check if user_id column exists
                 async with db.execute("PRAGMA table_info(search_analytics)") as cursor:
                     columns = await cursor.fetchall()
@@ -310,7 +370,7 @@ class DatabaseManager:
     ):
         """Log usage analytics event"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 # Check if user_id column exists
                 async with db.execute("PRAGMA table_info(usage_analytics)") as cursor:
                     columns = await cursor.fetchall()
@@ -344,7 +404,7 @@ class DatabaseManager:
                 
     async def get_usage_analytics(self) -> Dict[str, Any]:
         """Get comprehensive usage analytics"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             # Total documents
             async with db.execute("SELECT COUNT(*) FROM documents") as cursor:
                 total_documents = (await cursor.fetchone())[0]
@@ -429,55 +489,148 @@ class DatabaseManager:
     async def upsert_citation(self, citation_data: Dict[str, Any]):
         """Insert or update citation"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO citations 
-                    (id, document_id, document_title, page_number, paragraph_number, 
-                     section_title, content_hash, direct_url, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    citation_data['id'],
-                    citation_data['document_id'],
-                    citation_data['document_title'],
-                    citation_data['page_number'],
-                    citation_data.get('paragraph_number'),
-                    citation_data.get('section_title'),
-                    citation_data['content_hash'],
-                    citation_data.get('direct_url'),
-                    citation_data['created_at'],
-                    citation_data['updated_at']
-                ))
+            async with self._connect() as db:
+                await db.execute(CITATION_UPSERT_SQL, _citation_params(citation_data))
                 await db.commit()
                 
+    async def upsert_citations_bulk(self, citations: List[Dict[str, Any]]):
+        """Insert or update many citations in a single transaction"""
+        # Last write wins for repeated ids, as with successive upserts
+        unique = {citation['id']: citation for citation in citations}
+        if not unique:
+            return
+        
+        async with self.db_lock:
+            async with self._connect() as db:
+                await db.executemany(
+                    CITATION_UPSERT_SQL,
+                    [_citation_params(citation) for citation in unique.values()]
+                )
+                await db.commit()
+                
+    @staticmethod
+    def _citation_query(filters: Dict[str, Any]):
+        """SELECT over citations for the supported equality filters"""
+        filter_columns = tuple(column for column in CITATION_FILTERS if column in filters)
+        params = [filters[column] for column in filter_columns]
+        return _citation_select_sql(filter_columns), params
+        
     async def get_citations(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Get citations with filters"""
-        query = "SELECT * FROM citations WHERE 1=1"
-        params = []
+        query, params = self._citation_query(filters)
         
-        for key, value in filters.items():
-            if key in ['document_id', 'page_number', 'paragraph_number', 'content_hash']:
-                query += f" AND {key} = ?"
-                params.append(value)
-                
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
                 
+        return [dict(zip(CITATION_COLUMNS, row)) for row in rows]
+        
+    async def get_citation_columns(
+        self,
+        document_id: str,
+        batch_size: int = 500
+    ) -> Dict[str, np.ndarray]:
+        """A document's citations as column arrays for vectorized analysis
+        
+        Rows are fetched batch_size at a time and turned into arrays per batch,
+        so the full list of row tuples never exists at once.
+        """
+        names = ('document_id', 'page_number', 'paragraph_number', 'section_title', 'direct_url')
+        dtypes = (object, np.int64, object, object, object)
+        chunks: List[List[np.ndarray]] = [[] for _ in names]
+        
+        async with self._connect() as db:
+            async with db.execute("""
+                SELECT document_id, page_number, paragraph_number, section_title, direct_url
+                FROM citations WHERE document_id = ?
+            """, (document_id,)) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for column, values, dtype in zip(chunks, zip(*rows), dtypes):
+                        column.append(np.array(values, dtype=dtype))
+                        
+        return {
+            name: np.concatenate(column) if column else np.array([], dtype=dtype)
+            for name, column, dtype in zip(names, chunks, dtypes)
+        }
+        
+    async def find_related_citations(
+        self,
+        document_id: str,
+        page_number: int,
+        section_title: Optional[str],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Citations near a page of the same document plus same-section
+        citations from other documents, deduplicated, in one query"""
+        half = limit // 2
+        async with self._connect() as db:
+            async with db.execute("""
+                SELECT document_id, document_title, page_number, paragraph_number,
+                       section_title, direct_url, updated_at
+                FROM (
+                    SELECT *, 0 AS grp FROM (
+                        SELECT * FROM citations
+                        WHERE document_id = ?
+                          AND page_number BETWEEN ? AND ?
+                          AND page_number <> ?
+                        LIMIT ?
+                    )
+                    UNION ALL
+                    SELECT *, 1 AS grp FROM (
+                        SELECT * FROM citations
+                        WHERE section_title = ? AND document_id <> ?
+                        LIMIT ?
+                    )
+                )
+                GROUP BY document_id, page_number, paragraph_number
+                ORDER BY MIN(grp)
+                LIMIT ?
+            """, (
+                document_id, page_number - 2, page_number + 2, page_number, half,
+                section_title or None, document_id, half,
+                limit
+            )) as cursor:
+                rows = await cursor.fetchall()
+                
         columns = [
-            'id', 'document_id', 'document_title', 'page_number', 
-            'paragraph_number', 'section_title', 'content_hash', 
-            'direct_url', 'created_at', 'updated_at'
+            'document_id', 'document_title', 'page_number', 'paragraph_number',
+            'section_title', 'direct_url', 'updated_at'
         ]
-        
         return [dict(zip(columns, row)) for row in rows]
         
+    async def rewrite_citation_urls(self, document_id: str, old_prefix: str, new_prefix: str) -> int:
+        """Rewrite the URL prefix of all of a document's citations in one UPDATE"""
+        async with self.db_lock:
+            async with self._connect() as db:
+                cursor = await db.execute("""
+                    UPDATE citations
+                    SET direct_url = REPLACE(direct_url, ?, ?),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE document_id = ?
+                """, (old_prefix, new_prefix, document_id))
+                updated_count = cursor.rowcount
+                await db.commit()
+                return updated_count
+                
     async def delete_citations(self, document_id: str) -> int:
         """Delete citations for document"""
+        return await self.delete_citations_bulk([document_id])
+        
+    async def delete_citations_bulk(self, document_ids: List[str]) -> int:
+        """Delete citations for several documents in one statement"""
+        ids = list(set(document_ids))
+        if not ids:
+            return 0
+            
+        placeholders = ','.join('?' for _ in ids)
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 cursor = await db.execute(
-                    "DELETE FROM citations WHERE document_id = ?", 
-                    (document_id,)
+                    f"DELETE FROM citations WHERE document_id IN ({placeholders})",
+                    ids
                 )
                 deleted_count = cursor.rowcount
                 await db.commit()
@@ -485,7 +638,7 @@ class DatabaseManager:
                 
     async def get_searches_count_24h(self) -> int:
         """Get number of searches in last 24 hours"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute("""
                 SELECT COUNT(*) FROM search_analytics 
                 WHERE timestamp > datetime('now', '-24 hours')
@@ -495,16 +648,15 @@ class DatabaseManager:
     
     async def get_citation_stats(self) -> Dict[str, Any]:
         """Get citation statistics"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Total citations
-            async with db.execute("SELECT COUNT(*) FROM citations") as cursor:
-                total_citations = (await cursor.fetchone())[0]
-                
-            # Documents with citations
-            async with db.execute(
-                "SELECT COUNT(DISTINCT document_id) FROM citations"
-            ) as cursor:
-                documents_with_citations = (await cursor.fetchone())[0]
+        async with self._connect() as db:
+            # Totals, documents with citations and last-24h count in one scan
+            async with db.execute("""
+                SELECT COUNT(*),
+                       COUNT(DISTINCT document_id),
+                       COALESCE(SUM(created_at > datetime('now', '-24 hours')), 0)
+                FROM citations
+            """) as cursor:
+                total_citations, documents_with_citations, recent_citations = await cursor.fetchone()
                 
             # Average citations per document
             if documents_with_citations > 0:
@@ -512,13 +664,6 @@ class DatabaseManager:
             else:
                 avg_citations = 0
                 
-            # Recent citations (last 24 hours)
-            async with db.execute("""
-                SELECT COUNT(*) FROM citations 
-                WHERE created_at > datetime('now', '-24 hours')
-            """) as cursor:
-                recent_citations = (await cursor.fetchone())[0]
-                
         return {
             'total_citations': total_citations,
             'documents_with_citations': documents_with_citations,
@@ -529,7 +674,7 @@ class DatabaseManager:
     async def execute_sql(self, sql: str, params: tuple = ()):
         """Execute raw SQL"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute(sql, params)
                 await db.commit()
                 
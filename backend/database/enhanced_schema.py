@@ -6,19 +6,147 @@ import sqlite3
 import asyncio
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import json
 
+from database.connection import open_connection
+
 logger = logging.getLogger(__name__)
 
+_SEARCH_INSERT = """
+    INSERT INTO user_search_history 
+    (user_id, query_text, filters, results_count, response_time_ms)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_ACCESS_INSERT = """
+    INSERT INTO user_document_access 
+    (user_id, document_id, access_type, page_number, duration_seconds)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+def _search_row(
+    user_id: str,
+    query_text: str,
+    filters: Optional[Dict[str, Any]] = None,
+    results_count: int = 0,
+    response_time_ms: int = 0
+) -> tuple:
+    return (
+        user_id,
+        query_text,
+        json.dumps(filters) if filters else None,
+        results_count,
+        response_time_ms
+    )
+
+def _access_row(
+    user_id: str,
+    document_id: str,
+    access_type: str = "view",
+    page_number: Optional[int] = None,
+    duration_seconds: Optional[int] = None
+) -> tuple:
+    return (user_id, document_id, access_type, page_number, duration_seconds)
+
+
+class LogWriter:
+    """Background writer that batches search/access log inserts
+    
+    Callers enqueue rows and return immediately; a single task drains the
+    queue and writes up to ``batch_size`` rows per transaction, waiting at
+    most ``flush_interval`` seconds for a batch to fill.
+    """
+    
+    def __init__(self, manager: "EnhancedDatabaseManager", flush_interval: float = 0.02, batch_size: int = 64):
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def enqueue(self, kind: str, row: tuple):
+        """Queue a "search" or "access" row, starting the worker on first use"""
+        if self._task is None or self._task.done():
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        self.queue.put_nowait((kind, row))
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            
+            # Collect whatever else arrives before the deadline
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._write(batch)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} queued log rows: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+    
+    async def _write(self, batch: List[Tuple[str, tuple]]):
+        searches = [row for kind, row in batch if kind == "search"]
+        accesses = [row for kind, row in batch if kind == "access"]
+        
+        async with self.manager.db_lock:
+            async with self.manager._connect() as db:
+                if searches:
+                    await db.executemany(_SEARCH_INSERT, searches)
+                if accesses:
+                    await db.executemany(_ACCESS_INSERT, accesses)
+                await db.commit()
+    
+    async def drain(self):
+        """Wait until every queued row has been written"""
+        if self._task is not None and not self._task.done():
+            await self.queue.join()
+    
+    async def stop(self):
+        """Flush queued rows and stop the worker"""
+        await self.drain()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
 
 class EnhancedDatabaseManager:
     """Enhanced database manager with comprehensive user data storage"""
     
-    def __init__(self, db_path: str = "./backend/data/metadata.db"):
+    def __init__(
+        self,
+        db_path: str = "./backend/data/metadata.db",
+        conn: Optional[aiosqlite.Connection] = None
+    ):
         self.db_path = db_path
         self.db_lock = asyncio.Lock()
+        # Optional pre-opened connection shared with other managers
+        self._conn = conn
+        self.log_writer = LogWriter(self)
+    
+    async def close(self):
+        """Flush queued log writes"""
+        await self.log_writer.stop()
+    
+    def _connect(self):
+        """Connection scope for one operation"""
+        return open_connection(self.db_path, self._conn)
     
     async def upgrade_schema(self):
         """Upgrade database schema to include user relationships"""
@@ -26,170 +154,207 @@ class EnhancedDatabaseManager:
         db_path.parent.mkdir(parents=True, exist_ok=True)
         
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("PRAGMA foreign_keys = ON")
-                
-                # Check if documents table has user_id column
-                async with db.execute("PRAGMA table_info(documents)") as cursor:
-                    columns = await cursor.fetchall()
-                    column_names = [col[1] for col in columns]
+            async with self._connect() as db:
+                # Run every ALTER/CREATE in one transaction (one fsync). FK
+                # enforcement can only be toggled outside a transaction, so
+                # it is off for the migration and restored once it ends.
+                await db.execute("PRAGMA foreign_keys = OFF")
+                try:
+                    await db.execute("BEGIN IMMEDIATE")
                     
-                    if 'user_id' not in column_names:
-                        logger.info("Adding user_id to documents table")
-                        await db.execute("""
-                            ALTER TABLE documents ADD COLUMN user_id TEXT 
-                            REFERENCES users(id) ON DELETE SET NULL
-                        """)
-                        await db.execute("""
-                            CREATE INDEX IF NOT EXISTS idx_documents_user_id 
-                            ON documents(user_id)
-                        """)
-                
-                # Check if search_analytics has user_id
-                async with db.execute("PRAGMA table_info(search_analytics)") as cursor:
-                    columns = await cursor.fetchall()
-                    column_names = [col[1] for col in columns]
+                    # Check if documents table has user_id column
+                    async with db.execute("PRAGMA table_info(documents)") as cursor:
+                        columns = await cursor.fetchall()
+                        column_names = [col[1] for col in columns]
+                        
+                        if 'user_id' not in column_names:
+                            logger.info("Adding user_id to documents table")
+                            await db.execute("""
+                                ALTER TABLE documents ADD COLUMN user_id TEXT 
+                                REFERENCES users(id) ON DELETE SET NULL
+                            """)
+                            await db.execute("""
+                                CREATE INDEX IF NOT EXISTS idx_documents_user_id 
+                                ON documents(user_id)
+                            """)
                     
-                    if 'user_id' not in column_names:
-                        logger.info("Adding user_id to search_analytics table")
-                        await db.execute("""
-                            ALTER TABLE search_analytics ADD COLUMN user_id TEXT
-                            REFERENCES users(id) ON DELETE SET NULL
-                        """)
-                        await db.execute("""
-                            CREATE INDEX IF NOT EXISTS idx_search_analytics_user_id 
-                            ON search_analytics(user_id)
-                        """)
-                
-                # Check if usage_analytics has user_id
-                async with db.execute("PRAGMA table_info(usage_analytics)") as cursor:
-                    columns = await cursor.fetchall()
-                    column_names = [col[1] for col in columns]
+                    # Check if search_analytics has user_id
+                    async with db.execute("PRAGMA table_info(search_analytics)") as cursor:
+                        columns = await cursor.fetchall()
+                        column_names = [col[1] for col in columns]
+                        
+                        if 'user_id' not in column_names:
+                            logger.info("Adding user_id to search_analytics table")
+                            await db.execute("""
+                                ALTER TABLE search_analytics ADD COLUMN user_id TEXT
+                                REFERENCES users(id) ON DELETE SET NULL
+                            """)
+                            await db.execute("""
+                                CREATE INDEX IF NOT EXISTS idx_search_analytics_user_id 
+                                ON search_analytics(user_id)
+                            """)
                     
-                    if 'user_id' not in column_names:
-                        logger.info("Adding user_id to usage_analytics table")
-                        await db.execute("""
-                            ALTER TABLE usage_analytics ADD COLUMN user_id TEXT
-                            REFERENCES users(id) ON DELETE SET NULL
-                        """)
-                        await db.execute("""
-                            CREATE INDEX IF NOT EXISTS idx_usage_analytics_user_id 
-                            ON usage_analytics(user_id)
-                        """)
-                
-                # Create user preferences table
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS user_preferences (
-                        id TEXT PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        theme TEXT DEFAULT 'light',
-                        language TEXT DEFAULT 'en',
-                        notifications_enabled BOOLEAN DEFAULT 1,
-                        email_notifications BOOLEAN DEFAULT 1,
-                        default_category TEXT,
-                        items_per_page INTEGER DEFAULT 10,
-                        preferences_json TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                        UNIQUE(user_id)
-                    )
-                """)
-                
-                # Create user search history table
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS user_search_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id TEXT NOT NULL,
-                        query_text TEXT NOT NULL,
-                        filters TEXT,
-                        results_count INTEGER DEFAULT 0,
-                        response_time_ms INTEGER,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_search_history_user_id 
-                    ON user_search_history(user_id)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_search_history_timestamp 
-                    ON user_search_history(timestamp)
-                """)
-                
-                # Create user document access logs
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS user_document_access (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id TEXT NOT NULL,
-                        document_id TEXT NOT NULL,
-                        access_type TEXT NOT NULL,
-                        page_number INTEGER,
-                        duration_seconds INTEGER,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                        FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
-                    )
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_document_access_user_id 
-                    ON user_document_access(user_id)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_document_access_document_id 
-                    ON user_document_access(document_id)
-                """)
-                
-                # Create user sessions table for active session tracking
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS user_sessions (
-                        id TEXT PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        session_token TEXT UNIQUE NOT NULL,
-                        ip_address TEXT,
-                        user_agent TEXT,
-                        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        ended_at TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                    )
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id 
-                    ON user_sessions(user_id)
-                """)
-                
-                # Create user favorites/bookmarks
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS user_favorites (
-                        id TEXT PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        document_id TEXT NOT NULL,
-                        note TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                        FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE,
-                        UNIQUE(user_id, document_id)
-                    )
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_favorites_user_id 
-                    ON user_favorites(user_id)
-                """)
-                
-                await db.commit()
+                    # Check if usage_analytics has user_id
+                    async with db.execute("PRAGMA table_info(usage_analytics)") as cursor:
+                        columns = await cursor.fetchall()
+                        column_names = [col[1] for col in columns]
+                        
+                        if 'user_id' not in column_names:
+                            logger.info("Adding user_id to usage_analytics table")
+                            await db.execute("""
+                                ALTER TABLE usage_analytics ADD COLUMN user_id TEXT
+                                REFERENCES users(id) ON DELETE SET NULL
+                            """)
+                            await db.execute("""
+                                CREATE INDEX IF NOT EXISTS idx_usage_analytics_user_id 
+                                ON usage_analytics(user_id)
+                            """)
+                    
+                    # Create user preferences table
+                    await db.execute("""
+                        CREATE TABLE IF NOT EXISTS user_preferences (
+                            id TEXT PRIMARY KEY,
+                            user_id TEXT NOT NULL,
+                            theme TEXT DEFAULT 'light',
+                            language TEXT DEFAULT 'en',
+                            notifications_enabled BOOLEAN DEFAULT 1,
+                            email_notifications BOOLEAN DEFAULT 1,
+                            default_category TEXT,
+                            items_per_page INTEGER DEFAULT 10,
+                            preferences_json TEXT,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                            UNIQUE(user_id)
+                        )
+                    """)
+                    
+                    # Create user search history table
+                    await db.execute("""
+                        CREATE TABLE IF NOT EXISTS user_search_history (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            user_id TEXT NOT NULL,
+                            query_text TEXT NOT NULL,
+                            filters TEXT,
+                            results_count INTEGER DEFAULT 0,
+                            response_time_ms INTEGER,
+                            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                        )
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_search_history_user_id 
+                        ON user_search_history(user_id)
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_search_history_timestamp 
+                        ON user_search_history(timestamp)
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_search_history_user_timestamp 
+                        ON user_search_history(user_id, timestamp, id)
+                    """)
+                    
+                    # Create user document access logs
+                    await db.execute("""
+                        CREATE TABLE IF NOT EXISTS user_document_access (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            user_id TEXT NOT NULL,
+                            document_id TEXT NOT NULL,
+                            access_type TEXT NOT NULL,
+                            page_number INTEGER,
+                            duration_seconds INTEGER,
+                            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                            FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
+                        )
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_document_access_user_id 
+                        ON user_document_access(user_id)
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_document_access_document_id 
+                        ON user_document_access(document_id)
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_document_access_user_timestamp 
+                        ON user_document_access(user_id, timestamp, id)
+                    """)
+                    
+                    # Create user sessions table for active session tracking
+                    await db.execute("""
+                        CREATE TABLE IF NOT EXISTS user_sessions (
+                            id TEXT PRIMARY KEY,
+                            user_id TEXT NOT NULL,
+                            session_token TEXT UNIQUE NOT NULL,
+                            ip_address TEXT,
+                            user_agent TEXT,
+                            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            ended_at TIMESTAMP,
+                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                        )
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id 
+                        ON user_sessions(user_id)
+                    """)
+                    
+                    # Create user favorites/bookmarks
+                    await db.execute("""
+                        CREATE TABLE IF NOT EXISTS user_favorites (
+                            id TEXT PRIMARY KEY,
+                            user_id TEXT NOT NULL,
+                            document_id TEXT NOT NULL,
+                            note TEXT,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                            FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE,
+                            UNIQUE(user_id, document_id)
+                        )
+                    """)
+                    
+                    await db.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_user_favorites_user_id 
+                        ON user_favorites(user_id)
+                    """)
+                    
+                    await db.commit()
+                except BaseException:
+                    # Roll back first: the pragma is a no-op inside a transaction
+                    await db.rollback()
+                    raise
+                finally:
+                    # Never leave FK checks off, even on a shared connection
+                    await db.execute("PRAGMA foreign_keys = ON")
                 logger.info("Database schema upgraded successfully with user relationships")
     
+    @staticmethod
+    async def _page_total(db, rows, table: str, user_id: str, after) -> int:
+        """Total row count for a page whose last column is the per-user COUNT(*)"""
+        if rows:
+            return rows[0][-1]
+        if not after:
+            return 0
+        
+        # Cursor ran past the end - the count has to be fetched on its own
+        async with db.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE user_id = ?",
+            (user_id,)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+    
     async def get_user_preferences(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user preferences"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute(
                 "SELECT * FROM user_preferences WHERE user_id = ?",
                 (user_id,)
@@ -218,7 +383,7 @@ class EnhancedDatabaseManager:
         import uuid
         
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 pref_id = str(uuid.uuid4())
                 
                 await db.execute("""
@@ -252,51 +417,68 @@ class EnhancedDatabaseManager:
         results_count: int = 0,
         response_time_ms: int = 0
     ):
-        """Log user search to history"""
+        """Queue a user search for the history log"""
+        self.log_writer.enqueue("search", _search_row(
+            user_id, query_text, filters, results_count, response_time_ms
+        ))
+    
+    async def log_user_searches_bulk(self, user_id: str, searches: List[Dict[str, Any]]):
+        """Log several searches for a user in a single transaction
+        
+        Each entry takes the keyword arguments of log_user_search.
+        """
+        if not searches:
+            return
+        
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO user_search_history 
-                    (user_id, query_text, filters, results_count, response_time_ms)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    user_id,
-                    query_text,
-                    json.dumps(filters) if filters else None,
-                    results_count,
-                    response_time_ms
-                ))
+            async with self._connect() as db:
+                await db.executemany(_SEARCH_INSERT, [
+                    _search_row(user_id, **search) for search in searches
+                ])
                 
                 await db.commit()
     
     async def get_user_search_history(
         self,
         user_id: str,
-        limit: int = 50
-    ) -> List[Dict[str, Any]]:
-        """Get user's search history"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
+        limit: int = 50,
+        after: Optional[Tuple[str, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Get a page of the user's search history (newest first) and its total count
+        
+        ``after`` is the (timestamp, id) key of the last row of the previous
+        page; only older rows are returned.
+        
+        Returns (rows, total) where total counts all of the user's searches.
+        """
+        keyset = "AND (timestamp, id) < (?, ?)" if after else ""
+        params = (user_id, user_id, *after, limit) if after else (user_id, user_id, limit)
+        
+        async with self._connect() as db:
+            async with db.execute(f"""
                 SELECT id, query_text, filters, results_count, 
-                       response_time_ms, timestamp
+                       response_time_ms, timestamp,
+                       (SELECT COUNT(*) FROM user_search_history WHERE user_id = ?)
                 FROM user_search_history
-                WHERE user_id = ?
-                ORDER BY timestamp DESC
+                WHERE user_id = ? {keyset}
+                ORDER BY timestamp DESC, id DESC
                 LIMIT ?
-            """, (user_id, limit)) as cursor:
+            """, params) as cursor:
                 rows = await cursor.fetchall()
-                
-                return [
-                    {
-                        'id': row[0],
-                        'query_text': row[1],
-                        'filters': json.loads(row[2]) if row[2] else {},
-                        'results_count': row[3],
-                        'response_time_ms': row[4],
-                        'timestamp': row[5]
-                    }
-                    for row in rows
-                ]
+            
+            total = await self._page_total(db, rows, "user_search_history", user_id, after)
+            
+            return [
+                {
+                    'id': row[0],
+                    'query_text': row[1],
+                    'filters': json.loads(row[2]) if row[2] else {},
+                    'results_count': row[3],
+                    'response_time_ms': row[4],
+                    'timestamp': row[5]
+                }
+                for row in rows
+            ], total
     
     async def log_document_access(
         self,
@@ -306,56 +488,79 @@ class EnhancedDatabaseManager:
         page_number: Optional[int] = None,
         duration_seconds: Optional[int] = None
     ):
-        """Log user document access"""
+        """Queue a user document access for the access log"""
+        self.log_writer.enqueue("access", _access_row(
+            user_id, document_id, access_type, page_number, duration_seconds
+        ))
+    
+    async def log_document_accesses_bulk(self, user_id: str, accesses: List[Dict[str, Any]]):
+        """Log several document accesses for a user in a single transaction
+        
+        Each entry takes the keyword arguments of log_document_access.
+        """
+        if not accesses:
+            return
+        
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO user_document_access 
-                    (user_id, document_id, access_type, page_number, duration_seconds)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (user_id, document_id, access_type, page_number, duration_seconds))
+            async with self._connect() as db:
+                await db.executemany(_ACCESS_INSERT, [
+                    _access_row(user_id, **access) for access in accesses
+                ])
                 
                 await db.commit()
     
     async def get_user_document_access_history(
         self,
         user_id: str,
-        limit: int = 50
-    ) -> List[Dict[str, Any]]:
-        """Get user's document access history"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
+        limit: int = 50,
+        after: Optional[Tuple[str, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Get a page of the user's document access history (newest first) and its total count
+        
+        ``after`` is the (timestamp, id) key of the last row of the previous
+        page; only older rows are returned.
+        
+        Returns (rows, total) where total counts all of the user's accesses.
+        """
+        keyset = "AND (uda.timestamp, uda.id) < (?, ?)" if after else ""
+        params = (user_id, user_id, *after, limit) if after else (user_id, user_id, limit)
+        
+        async with self._connect() as db:
+            async with db.execute(f"""
                 SELECT uda.id, uda.document_id, d.filename, d.category,
                        uda.access_type, uda.page_number, uda.duration_seconds,
-                       uda.timestamp
+                       uda.timestamp,
+                       (SELECT COUNT(*) FROM user_document_access WHERE user_id = ?)
                 FROM user_document_access uda
                 LEFT JOIN documents d ON uda.document_id = d.id
-                WHERE uda.user_id = ?
-                ORDER BY uda.timestamp DESC
+                WHERE uda.user_id = ? {keyset}
+                ORDER BY uda.timestamp DESC, uda.id DESC
                 LIMIT ?
-            """, (user_id, limit)) as cursor:
+            """, params) as cursor:
                 rows = await cursor.fetchall()
-                
-                return [
-                    {
-                        'id': row[0],
-                        'document_id': row[1],
-                        'filename': row[2],
-                        'category': row[3],
-                        'access_type': row[4],
-                        'page_number': row[5],
-                        'duration_seconds': row[6],
-                        'timestamp': row[7]
-                    }
-                    for row in rows
-                ]
+            
+            total = await self._page_total(db, rows, "user_document_access", user_id, after)
+            
+            return [
+                {
+                    'id': row[0],
+                    'document_id': row[1],
+                    'filename': row[2],
+                    'category': row[3],
+                    'access_type': row[4],
+                    'page_number': row[5],
+                    'duration_seconds': row[6],
+                    'timestamp': row[7]
+                }
+                for row in rows
+            ], total
     
     async def add_favorite(self, user_id: str, document_id: str, note: Optional[str] = None):
         """Add document to user favorites"""
         import uuid
         
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 try:
                     await db.execute("""
                         INSERT INTO user_favorites (id, user_id, document_id, note)
@@ -371,7 +576,7 @@ class EnhancedDatabaseManager:
     async def remove_favorite(self, user_id: str, document_id: str):
         """Remove document from user favorites"""
         async with self.db_lock:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._connect() as db:
                 await db.execute("""
                     DELETE FROM user_favorites 
                     WHERE user_id = ? AND document_id = ?
@@ -379,35 +584,53 @@ class EnhancedDatabaseManager:
                 
                 await db.commit()
     
-    async def get_user_favorites(self, user_id: str) -> List[Dict[str, Any]]:
-        """Get user's favorite documents"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
+    async def get_user_favorites(
+        self,
+        user_id: str,
+        limit: int = 50,
+        after: Optional[Tuple[str, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Get a page of the user's favorite documents (newest first) and its total count
+        
+        ``after`` is the (created_at, id) key of the last row of the previous
+        page; only older rows are returned.
+        
+        Returns (rows, total) where total counts all of the user's favorites.
+        """
+        keyset = "AND (uf.created_at, uf.id) < (?, ?)" if after else ""
+        params = (user_id, user_id, *after, limit) if after else (user_id, user_id, limit)
+        
+        async with self._connect() as db:
+            async with db.execute(f"""
                 SELECT uf.id, uf.document_id, d.filename, d.category,
-                       d.file_path, uf.note, uf.created_at
+                       d.file_path, uf.note, uf.created_at,
+                       (SELECT COUNT(*) FROM user_favorites WHERE user_id = ?)
                 FROM user_favorites uf
                 LEFT JOIN documents d ON uf.document_id = d.id
-                WHERE uf.user_id = ?
-                ORDER BY uf.created_at DESC
-            """, (user_id,)) as cursor:
+                WHERE uf.user_id = ? {keyset}
+                ORDER BY uf.created_at DESC, uf.id DESC
+                LIMIT ?
+            """, params) as cursor:
                 rows = await cursor.fetchall()
-                
-                return [
-                    {
-                        'id': row[0],
-                        'document_id': row[1],
-                        'filename': row[2],
-                        'category': row[3],
-                        'file_path': row[4],
-                        'note': row[5],
-                        'created_at': row[6]
-                    }
-                    for row in rows
-                ]
+            
+            total = await self._page_total(db, rows, "user_favorites", user_id, after)
+            
+            return [
+                {
+                    'id': row[0],
+                    'document_id': row[1],
+                    'filename': row[2],
+                    'category': row[3],
+                    'file_path': row[4],
+                    'note': row[5],
+                    'created_at': row[6]
+                }
+                for row in rows
+            ], total
     
     async def get_user_analytics(self, user_id: str) -> Dict[str, Any]:
         """Get comprehensive analytics for a specific user"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             # Total searches
             async with db.execute(
                 "SELECT COUNT(*) FROM user_search_history WHERE user_id = ?",
@@ -7,6 +7,8 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 import logging
 
+from database.connection import configure_connection
+
 logger = logging.getLogger(__name__)
 
 class UserDatabase:
@@ -18,7 +20,7 @@ class UserDatabase:
     
     def get_connection(self):
         """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
+        conn = configure_connection(sqlite3.connect(self.db_path))
         conn.row_factory = sqlite3.Row
         return conn
     
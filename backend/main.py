@@ -5,6 +5,7 @@ from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTa
 from fastapi.websockets import WebSocketDisconnect
 import socketio
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
@@ -34,7 +35,10 @@ from routes.auth import router as auth_router
 from routes.user_data import router as user_data_router
 from routes.system_status import router as system_status_router
 from routes import analytics as analytics_routes
+from routes import settings as settings_routes
+from routes import user_data as user_data_routes
 from database.enhanced_schema import EnhancedDatabaseManager
+from utils.auth import calibrate_bcrypt_rounds, warm_bcrypt_pool, close_bcrypt_pool
 
 # Initialize settings
 settings = Settings()
@@ -77,6 +81,14 @@ async def lifespan(app: FastAPI):
     # Initialize document processor
     await document_processor.initialize()
     
+    # Start coalescing writer for user settings
+    settings_routes.start_settings_writer()
+    
+    # Pick the bcrypt cost for this hardware and start the hashing workers
+    # before the first login needs them
+    await asyncio.to_thread(calibrate_bcrypt_rounds)
+    await asyncio.to_thread(warm_bcrypt_pool)
+    
     # Load existing processed documents into vector store
     try:
         logger.info("Loading existing documents into search engine...")
@@ -114,7 +126,13 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("Shutting down system")
+    await settings_routes.stop_settings_writer()
+    await enhanced_db_manager.close()
+    await user_data_routes.enhanced_db.close()
     await db_manager.close()
+    document_processor.close()
+    search_engine.close()
+    close_bcrypt_pool()
 
 # Create FastAPI app
 app = FastAPI(
@@ -133,6 +151,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (history, notification and favorites lists)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -202,15 +223,9 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             suggestions = await get_context_suggestions(case_context)
             
             # Send suggestions back to client
-            response = {
-                "type": "suggestions",
-                "data": [s.dict() for s in suggestions],
-                "timestamp": asyncio.get_event_loop().time()
-            }
-            
-            await websocket_manager.send_personal_message(
-                json.dumps(response), 
-                client_id
+            await websocket_manager.send_suggestions(
+                client_id,
+                [s.dict() for s in suggestions]
             )
             
     except WebSocketDisconnect:
@@ -2,6 +2,7 @@
 Authentication routes
 """
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from datetime import datetime, timedelta
 import logging
 
@@ -19,7 +20,10 @@ from utils.auth import (
     create_access_token,
     create_refresh_token,
     decode_token,
+    revoke_token,
+    security,
     get_current_active_user,
+    AuthUser,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS
 )
@@ -45,7 +49,7 @@ async def register(user_data: UserCreate):
             )
         
         # Hash password
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash(user_data.password)
         
         # Create user
         user = await user_db.create_user(
@@ -96,7 +100,7 @@ async def login(user_data: UserLogin):
             )
         
         # Verify password
-        if not verify_password(user_data.password, user['hashed_password']):
+        if not await verify_password(user_data.password, user['hashed_password']):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -211,12 +215,14 @@ async def refresh_token(request: RefreshTokenRequest):
 @router.post("/logout")
 async def logout(
     request: RefreshTokenRequest,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """Logout user by revoking refresh token"""
+    """Logout user by revoking the refresh token and the current access token"""
     try:
         await user_db.revoke_refresh_token(request.refresh_token)
-        logger.info(f"User logged out: {current_user['email']}")
+        revoke_token(credentials.credentials)
+        logger.info(f"User logged out: {current_user.email}")
         
         return {"message": "Successfully logged out"}
         
@@ -228,10 +234,10 @@ async def logout(
         )
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: dict = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: AuthUser = Depends(get_current_active_user)):
     """Get current user information"""
     try:
-        user = await user_db.get_user_by_id(current_user['user_id'])
+        user = await user_db.get_user_by_id(current_user.user_id)
         
         if not user:
             raise HTTPException(
@@ -261,12 +267,12 @@ async def get_current_user_info(current_user: dict = Depends(get_current_active_
 @router.post("/change-password")
 async def change_password(
     request: PasswordChangeRequest,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Change user password"""
     try:
         # Get user
-        user = await user_db.get_user_by_id(current_user['user_id'])
+        user = await user_db.get_user_by_id(current_user.user_id)
         
         if not user:
             raise HTTPException(
@@ -275,14 +281,14 @@ async def change_password(
             )
         
         # Verify current password
-        if not verify_password(request.current_password, user['hashed_password']):
+        if not await verify_password(request.current_password, user['hashed_password']):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Current password is incorrect"
             )
         
         # Hash new password
-        new_hashed_password = get_password_hash(request.new_password)
+        new_hashed_password = await get_password_hash(request.new_password)
         
         # Update password
         success = await user_db.update_password(user['id'], new_hashed_password)
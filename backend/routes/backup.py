@@ -5,7 +5,7 @@ from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from typing import Optional
 import logging
 
-from utils.auth import get_current_active_user
+from utils.auth import AuthUser, get_current_active_user
 from services.backup_manager import backup_manager
 
 logger = logging.getLogger(__name__)
@@ -16,14 +16,14 @@ router = APIRouter(prefix="/api/backup", tags=["backup"])
 async def create_backup(
     background_tasks: BackgroundTasks,
     backup_type: str = "full",
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Create a new backup"""
+    # Check if user is admin
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
     try:
-        # Check if user is admin
-        if not current_user.get('is_admin', False):
-            raise HTTPException(status_code=403, detail="Admin access required")
-        
         # Create backup in background
         backup_info = await backup_manager.create_backup(backup_type)
         
@@ -36,7 +36,7 @@ async def create_backup(
         raise HTTPException(status_code=500, detail=f"Backup creation failed: {str(e)}")
 
 @router.get("/list")
-async def list_backups(current_user: dict = Depends(get_current_active_user)):
+async def list_backups(current_user: AuthUser = Depends(get_current_active_user)):
     """List all available backups"""
     try:
         backups = await backup_manager.list_backups()
@@ -51,63 +51,59 @@ async def list_backups(current_user: dict = Depends(get_current_active_user)):
 @router.post("/restore/{backup_name}")
 async def restore_backup(
     backup_name: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Restore from a backup"""
+    # Check if user is admin
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
     try:
-        # Check if user is admin
-        if not current_user.get('is_admin', False):
-            raise HTTPException(status_code=403, detail="Admin access required")
-        
         success = await backup_manager.restore_backup(backup_name)
-        
-        if success:
-            return {
-                'message': f'Backup {backup_name} restored successfully',
-                'note': 'System restart recommended'
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Backup restore failed")
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Backup restore error: {e}")
         raise HTTPException(status_code=500, detail=f"Backup restore failed: {str(e)}")
+    
+    if not success:
+        raise HTTPException(status_code=500, detail="Backup restore failed")
+    
+    return {
+        'message': f'Backup {backup_name} restored successfully',
+        'note': 'System restart recommended'
+    }
 
 @router.delete("/{backup_name}")
 async def delete_backup(
     backup_name: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Delete a backup"""
+    # Check if user is admin
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
     try:
-        # Check if user is admin
-        if not current_user.get('is_admin', False):
-            raise HTTPException(status_code=403, detail="Admin access required")
-        
         success = await backup_manager.delete_backup(backup_name)
-        
-        if success:
-            return {'message': f'Backup {backup_name} deleted successfully'}
-        else:
-            raise HTTPException(status_code=500, detail="Backup deletion failed")
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Backup deletion error: {e}")
         raise HTTPException(status_code=500, detail=f"Backup deletion failed: {str(e)}")
+    
+    if not success:
+        raise HTTPException(status_code=500, detail="Backup deletion failed")
+    
+    return {'message': f'Backup {backup_name} deleted successfully'}
 
 @router.post("/cleanup")
 async def cleanup_old_backups(
     keep_count: int = 10,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Clean up old backups, keeping only the most recent ones"""
+    # Check if user is admin
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
     try:
-        # Check if user is admin
-        if not current_user.get('is_admin', False):
-            raise HTTPException(status_code=403, detail="Admin access required")
-        
         await backup_manager.cleanup_old_backups(keep_count)
         
         return {
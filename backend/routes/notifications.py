@@ -1,127 +1,188 @@
 """
 Notifications API routes
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from typing import Any, Optional
+import hashlib
+import json
 import logging
 
-from utils.auth import get_current_active_user
+from utils.auth import AuthUser, get_current_active_user
+from utils.pagination import encode_cursor, decode_cursor
 from services.notification_service import notification_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check the client's If-None-Match header against an ETag"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in candidates or '*' in candidates
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+def _json_response(payload: Any, etag: str) -> Response:
+    body = json.dumps(jsonable_encoder(payload), separators=(',', ':')).encode('utf-8')
+    return Response(
+        content=body,
+        media_type='application/json',
+        headers={'ETag': etag, 'Cache-Control': 'no-cache'}
+    )
+
 @router.post("/email")
 async def send_email(
     to: str,
     subject: str,
     body: str,
     priority: str = "normal",
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Send email notification"""
     try:
         success = await notification_service.send_email_notification(
             to, subject, body, priority
         )
-        
-        if success:
-            return {'message': 'Email notification sent successfully'}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to send email")
     except Exception as e:
         logger.error(f"Email notification error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to send email")
+    
+    return {'message': 'Email notification sent successfully'}
 
 @router.post("/push")
 async def send_push(
     title: str,
     message: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Send push notification to current user"""
     try:
-        user_id = current_user.get('user_id')
+        user_id = current_user.user_id
         success = await notification_service.send_push_notification(
             user_id, title, message
         )
-        
-        if success:
-            return {'message': 'Push notification sent successfully'}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to send push notification")
     except Exception as e:
         logger.error(f"Push notification error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to send push notification")
+    
+    return {'message': 'Push notification sent successfully'}
 
 @router.post("/alert")
 async def create_alert(
     alert_type: str,
     message: str,
     severity: str = "info",
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Create system alert"""
+    # Check if user is admin for critical alerts
+    if severity == "critical" and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required for critical alerts")
+    
     try:
-        # Check if user is admin for critical alerts
-        if severity == "critical" and not current_user.get('is_admin', False):
-            raise HTTPException(status_code=403, detail="Admin access required for critical alerts")
-        
         success = await notification_service.send_system_alert(
             alert_type, message, severity
         )
-        
-        if success:
-            return {'message': 'System alert created successfully'}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to create alert")
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"System alert error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to create alert")
+    
+    return {'message': 'System alert created successfully'}
 
 @router.get("")
 async def get_notifications(
+    request: Request,
     notification_type: Optional[str] = None,
     limit: int = 50,
-    current_user: dict = Depends(get_current_active_user)
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
-    """Get user notifications"""
+    """Get user notifications (returns 304 when the client's ETag is current)"""
     try:
-        user_id = current_user.get('user_id')
+        user_id = current_user.user_id
         notifications = await notification_service.get_notifications(
             user_id=user_id,
             notification_type=notification_type,
-            limit=limit
+            limit=limit,
+            after=decode_cursor(cursor)
         )
         
-        return {
+        next_cursor = None
+        if len(notifications) == limit:
+            next_cursor = encode_cursor(*notification_service.sort_key(notifications[-1]))
+        
+        response = _json_response({
             'notifications': notifications,
-            'count': len(notifications)
-        }
+            'count': len(notifications),
+            'next_cursor': next_cursor
+        }, etag='')
+        
+        # Strong ETag from the serialized body
+        etag = '"' + hashlib.blake2b(response.body, digest_size=12).hexdigest() + '"'
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+        
+        response.headers['ETag'] = etag
+        return response
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get notifications error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get notifications")
 
 @router.get("/alerts")
 async def get_alerts(
+    request: Request,
     severity: Optional[str] = None,
     acknowledged: Optional[bool] = None,
-    current_user: dict = Depends(get_current_active_user)
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
-    """Get system alerts"""
+    """Get system alerts (returns 304 when the client's ETag is current)"""
+    # Alerts are shared by all users, so the log file's state plus the query
+    # identifies the response without building it
+    query_key = f"{severity}|{acknowledged}|{limit}|{cursor}".encode('utf-8')
+    etag = '"{}-{}"'.format(
+        notification_service.version_tag,
+        hashlib.blake2b(query_key, digest_size=8).hexdigest()
+    )
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    
     try:
         alerts = await notification_service.get_system_alerts(
             severity=severity,
-            acknowledged=acknowledged
+            acknowledged=acknowledged,
+            limit=limit,
+            after=decode_cursor(cursor)
         )
         
-        return {
+        next_cursor = None
+        if len(alerts) == limit:
+            next_cursor = encode_cursor(*notification_service.sort_key(alerts[-1]))
+        
+        return _json_response({
             'alerts': alerts,
-            'count': len(alerts)
-        }
+            'count': len(alerts),
+            'next_cursor': next_cursor
+        }, etag)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Get alerts error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get alerts")
@@ -129,58 +190,58 @@ async def get_alerts(
 @router.post("/alerts/{alert_id}/acknowledge")
 async def acknowledge_alert(
     alert_id: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Acknowledge a system alert"""
     try:
-        success = await notification_service.acknowledge_alert(alert_id)
-        
-        if success:
-            return {'message': 'Alert acknowledged successfully'}
-        else:
-            raise HTTPException(status_code=404, detail="Alert not found")
-    except HTTPException:
-        raise
+        result = await notification_service.acknowledge_alert(alert_id)
     except Exception as e:
         logger.error(f"Acknowledge alert error: {e}")
+        result = "error"
+    
+    if result == "not_found":
+        raise HTTPException(status_code=404, detail="Alert not found")
+    if result == "error":
         raise HTTPException(status_code=500, detail="Failed to acknowledge alert")
+    
+    return {'message': 'Alert acknowledged successfully'}
 
 @router.post("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Mark a notification as read"""
     try:
-        user_id = current_user.get('user_id')
-        success = await notification_service.mark_notification_read(notification_id, user_id)
-        
-        if success:
-            return {'message': 'Notification marked as read'}
-        else:
-            raise HTTPException(status_code=404, detail="Notification not found")
-    except HTTPException:
-        raise
+        user_id = current_user.user_id
+        result = await notification_service.mark_notification_read(notification_id, user_id)
     except Exception as e:
         logger.error(f"Mark notification read error: {e}")
+        result = "error"
+    
+    if result == "not_found":
+        raise HTTPException(status_code=404, detail="Notification not found")
+    if result == "error":
         raise HTTPException(status_code=500, detail="Failed to mark notification as read")
+    
+    return {'message': 'Notification marked as read'}
 
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Delete a notification"""
     try:
-        user_id = current_user.get('user_id')
-        success = await notification_service.delete_notification(notification_id, user_id)
-        
-        if success:
-            return {'message': 'Notification deleted successfully'}
-        else:
-            raise HTTPException(status_code=404, detail="Notification not found")
-    except HTTPException:
-        raise
+        user_id = current_user.user_id
+        result = await notification_service.delete_notification(notification_id, user_id)
     except Exception as e:
         logger.error(f"Delete notification error: {e}")
+        result = "error"
+    
+    if result == "not_found":
+        raise HTTPException(status_code=404, detail="Notification not found")
+    if result == "error":
         raise HTTPException(status_code=500, detail="Failed to delete notification")
+    
+    return {'message': 'Notification deleted successfully'}
@@ -2,13 +2,14 @@
 System settings API routes
 """
 from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+import asyncio
 import logging
 import json
 from pathlib import Path
-from datetime import datetime
 
-from utils.auth import get_current_active_user
+from utils.auth import AuthUser, get_current_active_user
+from utils.clock import iso_now
 from config.settings import settings as app_settings
 
 logger = logging.getLogger(__name__)
@@ -18,8 +19,29 @@ router = APIRouter(prefix="/api/settings", tags=["settings"])
 # Settings storage file
 SETTINGS_FILE = Path("data/user_settings.json")
 
+# Coalescing window for queued settings writes (seconds)
+SETTINGS_FLUSH_INTERVAL = 0.2
+
+# Latest not-yet-flushed settings per user (None marks a reset); the queue only
+# carries user ids. Each queued request waits on a future that resolves once its
+# batch is on disk.
+_pending_settings: Dict[str, Optional[Dict[str, Any]]] = {}
+_pending_waiters: List[asyncio.Future] = []
+_flushing_settings: Dict[str, Optional[Dict[str, Any]]] = {}
+
+# Every rewrite of SETTINGS_FILE goes through _write_batch under this lock, so
+# updates and resets never interleave their read-modify-write cycles
+_file_lock = asyncio.Lock()
+_settings_queue: Optional[asyncio.Queue] = None
+_flush_task: Optional[asyncio.Task] = None
+
 def load_user_settings(user_id: str) -> Dict[str, Any]:
     """Load user-specific settings from file"""
+    # Pending entries are newer than the batch being flushed, so check them first
+    for queued in (_pending_settings, _flushing_settings):
+        if user_id in queued:
+            settings = queued[user_id]
+            return {} if settings is None else dict(settings)
     try:
         if SETTINGS_FILE.exists():
             with open(SETTINGS_FILE, 'r') as f:
@@ -30,8 +52,8 @@ def load_user_settings(user_id: str) -> Dict[str, Any]:
         logger.error(f"Error loading user settings: {e}")
         return {}
 
-def save_user_settings(user_id: str, settings: Dict[str, Any]):
-    """Save user-specific settings to file"""
+def save_settings_batch(batch: Dict[str, Optional[Dict[str, Any]]]) -> bool:
+    """Save several users' settings to file in one rewrite; None resets a user"""
     try:
         # Ensure data directory exists
         SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -43,26 +65,119 @@ def save_user_settings(user_id: str, settings: Dict[str, Any]):
                 all_settings = json.load(f)
         
         # Update user settings
-        all_settings[user_id] = {
-            **settings,
-            'updated_at': datetime.now().isoformat()
-        }
+        updated_at = iso_now()
+        for user_id, settings in batch.items():
+            if settings is None:
+                # Drop the stored entry (loads fall back to defaults)
+                all_settings.pop(user_id, None)
+                continue
+            all_settings[user_id] = {
+                **settings,
+                'updated_at': updated_at
+            }
         
         # Save to file
         with open(SETTINGS_FILE, 'w') as f:
-            json.dump(all_settings, f, indent=2)
+            json.dump(all_settings, f, separators=(',', ':'))
             
-        logger.info(f"Settings saved for user {user_id}")
+        logger.info(f"Settings saved for users {', '.join(batch)}")
         return True
     except Exception as e:
         logger.error(f"Error saving user settings: {e}")
         return False
 
+async def _write_batch(batch: Dict[str, Optional[Dict[str, Any]]]) -> bool:
+    """Apply a batch to the settings file off the event loop, one rewrite at a time"""
+    async with _file_lock:
+        return await asyncio.to_thread(save_settings_batch, batch)
+
+async def _submit_settings(user_id: str, settings: Optional[Dict[str, Any]]) -> bool:
+    """Hand an update (or a reset, as None) to the writer and wait until it is on disk"""
+    if _settings_queue is None:
+        # Writer not running (e.g. scripts, tests) - write through
+        return await _write_batch({user_id: settings})
+    
+    _pending_settings[user_id] = settings
+    done = asyncio.get_running_loop().create_future()
+    _pending_waiters.append(done)
+    _settings_queue.put_nowait(user_id)
+    return await done
+
+async def queue_user_settings(user_id: str, settings: Dict[str, Any]) -> bool:
+    """Queue a settings write and wait until it is on disk
+    
+    Updates arriving within one flush interval share a single file rewrite.
+    Returns False if that write failed.
+    """
+    return await _submit_settings(user_id, settings)
+
+async def reset_user_settings(user_id: str) -> bool:
+    """Queue removal of a user's stored settings and wait until it is on disk
+    
+    Goes through the same writer as updates, so it lands after any batch
+    already being flushed and replaces any update still pending.
+    """
+    return await _submit_settings(user_id, None)
+
+async def _flush_pending_settings():
+    """Write every pending user's latest settings to disk and wake their requests"""
+    global _pending_settings, _pending_waiters, _flushing_settings
+    if not _pending_settings and not _pending_waiters:
+        return
+    
+    # Swap the buffers so updates made during the write start the next batch
+    batch, waiters = _pending_settings, _pending_waiters
+    _pending_settings, _pending_waiters = {}, []
+    _flushing_settings = batch
+    try:
+        success = await _write_batch(batch) if batch else True
+    finally:
+        _flushing_settings = {}
+    
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(success)
+
+async def _flush_loop():
+    """Background worker draining the settings queue; a None id stops it"""
+    while True:
+        user_id = await _settings_queue.get()
+        stopping = user_id is None
+        
+        # Let a burst of updates accumulate, then drop the queued ids
+        if not stopping:
+            await asyncio.sleep(SETTINGS_FLUSH_INTERVAL)
+        while not _settings_queue.empty():
+            stopping |= _settings_queue.get_nowait() is None
+        
+        await _flush_pending_settings()
+        if stopping:
+            return
+
+def start_settings_writer():
+    """Start the background settings writer (called from the app lifespan)"""
+    global _settings_queue, _flush_task
+    if _flush_task is None:
+        _settings_queue = asyncio.Queue()
+        _flush_task = asyncio.create_task(_flush_loop())
+
+async def stop_settings_writer():
+    """Stop the background settings writer and flush anything still pending"""
+    global _settings_queue, _flush_task
+    if _flush_task is not None:
+        # Let the writer finish its current batch rather than cancelling it
+        # mid-write and leaving requests waiting forever
+        _settings_queue.put_nowait(None)
+        await _flush_task
+        _flush_task = None
+        _settings_queue = None
+    await _flush_pending_settings()
+
 @router.get("")
-async def get_settings(current_user: dict = Depends(get_current_active_user)):
+async def get_settings(current_user: AuthUser = Depends(get_current_active_user)):
     """Get current user settings"""
     try:
-        user_id = current_user.get('user_id')
+        user_id = current_user.user_id
         
         # Load user-specific settings
         user_settings = load_user_settings(user_id)
@@ -114,11 +229,11 @@ async def get_settings(current_user: dict = Depends(get_current_active_user)):
 @router.post("")
 async def update_settings(
     settings: Dict[str, Any],
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Update user settings"""
     try:
-        user_id = current_user.get('user_id')
+        user_id = current_user.user_id
         
         # Validate settings
         validated_settings = {}
@@ -193,8 +308,9 @@ async def update_settings(
         if 'embeddingModel' in settings:
             validated_settings['embeddingModel'] = settings['embeddingModel']
         
-        # Save settings
-        success = save_user_settings(user_id, validated_settings)
+        # The background writer coalesces bursts into one disk write; this
+        # returns once that write has finished
+        success = await queue_user_settings(user_id, validated_settings)
         
         if success:
             return {
@@ -211,13 +327,13 @@ async def update_settings(
         raise HTTPException(status_code=500, detail="Failed to update settings")
 
 @router.post("/reset")
-async def reset_settings(current_user: dict = Depends(get_current_active_user)):
+async def reset_settings(current_user: AuthUser = Depends(get_current_active_user)):
     """Reset user settings to defaults"""
     try:
-        user_id = current_user.get('user_id')
+        user_id = current_user.user_id
         
-        # Save empty settings (will use defaults)
-        success = save_user_settings(user_id, {})
+        # Replaces any queued update and is written after any in-flight batch
+        success = await reset_user_settings(user_id)
         
         if success:
             return {
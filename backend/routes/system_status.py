@@ -3,7 +3,8 @@ System status and health check routes
 """
 from fastapi import APIRouter
 import logging
-from datetime import datetime
+
+from utils.clock import iso_now
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +15,7 @@ async def get_system_status():
     """Get detailed system status"""
     return {
         "status": "online",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": iso_now(),
         "services": {
             "api": "online",
             "websocket": "online",
@@ -39,5 +40,5 @@ async def ping():
     return {
         "status": "ok",
         "message": "pong",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": iso_now()
     }
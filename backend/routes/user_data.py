@@ -5,7 +5,8 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from typing import Optional, Dict, Any, List
 import logging
 
-from utils.auth import get_current_active_user
+from utils.auth import AuthUser, get_current_active_user
+from utils.pagination import encode_cursor, decode_cursor
 from database.enhanced_schema import EnhancedDatabaseManager
 from pydantic import BaseModel, Field
 
@@ -43,10 +44,10 @@ class FavoriteRequest(BaseModel):
 
 
 @router.get("/preferences")
-async def get_preferences(current_user: dict = Depends(get_current_active_user)):
+async def get_preferences(current_user: AuthUser = Depends(get_current_active_user)):
     """Get user preferences"""
     try:
-        preferences = await enhanced_db.get_user_preferences(current_user['user_id'])
+        preferences = await enhanced_db.get_user_preferences(current_user.user_id)
         
         if not preferences:
             # Return default preferences if none exist
@@ -72,16 +73,16 @@ async def get_preferences(current_user: dict = Depends(get_current_active_user))
 @router.post("/preferences")
 async def save_preferences(
     preferences: UserPreferences,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Save user preferences"""
     try:
         await enhanced_db.save_user_preferences(
-            current_user['user_id'],
+            current_user.user_id,
             preferences.dict()
         )
         
-        logger.info(f"Preferences saved for user: {current_user['email']}")
+        logger.info(f"Preferences saved for user: {current_user.email}")
         
         return {"message": "Preferences saved successfully"}
         
@@ -96,17 +97,25 @@ async def save_preferences(
 @router.get("/search-history")
 async def get_search_history(
     limit: int = 50,
-    current_user: dict = Depends(get_current_active_user)
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Get user's search history"""
     try:
-        history = await enhanced_db.get_user_search_history(
-            current_user['user_id'],
-            limit=limit
+        history, total = await enhanced_db.get_user_search_history(
+            current_user.user_id,
+            limit=limit,
+            after=decode_cursor(cursor)
         )
         
-        return {"history": history, "count": len(history)}
+        next_cursor = None
+        if len(history) == limit:
+            next_cursor = encode_cursor(history[-1]['timestamp'], history[-1]['id'])
         
+        return {"history": history, "count": total, "next_cursor": next_cursor}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting search history: {e}")
         raise HTTPException(
@@ -118,12 +127,12 @@ async def get_search_history(
 @router.post("/document-access")
 async def log_document_access(
     access_log: DocumentAccessLog,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Log document access"""
     try:
         await enhanced_db.log_document_access(
-            user_id=current_user['user_id'],
+            user_id=current_user.user_id,
             document_id=access_log.document_id,
             access_type=access_log.access_type,
             page_number=access_log.page_number,
@@ -143,17 +152,25 @@ async def log_document_access(
 @router.get("/document-history")
 async def get_document_access_history(
     limit: int = 50,
-    current_user: dict = Depends(get_current_active_user)
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Get user's document access history"""
     try:
-        history = await enhanced_db.get_user_document_access_history(
-            current_user['user_id'],
-            limit=limit
+        history, total = await enhanced_db.get_user_document_access_history(
+            current_user.user_id,
+            limit=limit,
+            after=decode_cursor(cursor)
         )
         
-        return {"history": history, "count": len(history)}
+        next_cursor = None
+        if len(history) == limit:
+            next_cursor = encode_cursor(history[-1]['timestamp'], history[-1]['id'])
+        
+        return {"history": history, "count": total, "next_cursor": next_cursor}
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting document history: {e}")
         raise HTTPException(
@@ -165,49 +182,46 @@ async def get_document_access_history(
 @router.post("/favorites")
 async def add_favorite(
     favorite: FavoriteRequest,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Add document to favorites"""
     try:
         success = await enhanced_db.add_favorite(
-            current_user['user_id'],
+            current_user.user_id,
             favorite.document_id,
             favorite.note
         )
-        
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Document already in favorites or doesn't exist"
-            )
-        
-        logger.info(f"Favorite added by user: {current_user['email']}")
-        
-        return {"message": "Added to favorites successfully"}
-        
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Error adding favorite: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to add favorite"
         )
+    
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Document already in favorites or doesn't exist"
+        )
+    
+    logger.info(f"Favorite added by user: {current_user.email}")
+    
+    return {"message": "Added to favorites successfully"}
 
 
 @router.delete("/favorites/{document_id}")
 async def remove_favorite(
     document_id: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: AuthUser = Depends(get_current_active_user)
 ):
     """Remove document from favorites"""
     try:
         await enhanced_db.remove_favorite(
-            current_user['user_id'],
+            current_user.user_id,
             document_id
         )
         
-        logger.info(f"Favorite removed by user: {current_user['email']}")
+        logger.info(f"Favorite removed by user: {current_user.email}")
         
         return {"message": "Removed from favorites successfully"}
         
@@ -220,13 +234,27 @@ async def remove_favorite(
 
 
 @router.get("/favorites")
-async def get_favorites(current_user: dict = Depends(get_current_active_user)):
+async def get_favorites(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: AuthUser = Depends(get_current_active_user)
+):
     """Get user's favorite documents"""
     try:
-        favorites = await enhanced_db.get_user_favorites(current_user['user_id'])
+        favorites, total = await enhanced_db.get_user_favorites(
+            current_user.user_id,
+            limit=limit,
+            after=decode_cursor(cursor)
+        )
+        
+        next_cursor = None
+        if len(favorites) == limit:
+            next_cursor = encode_cursor(favorites[-1]['created_at'], favorites[-1]['id'])
         
-        return {"favorites": favorites, "count": len(favorites)}
+        return {"favorites": favorites, "count": total, "next_cursor": next_cursor}
         
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting favorites: {e}")
         raise HTTPException(
@@ -236,10 +264,10 @@ async def get_favorites(current_user: dict = Depends(get_current_active_user)):
 
 
 @router.get("/analytics")
-async def get_user_analytics(current_user: dict = Depends(get_current_active_user)):
+async def get_user_analytics(current_user: AuthUser = Depends(get_current_active_user)):
     """Get user's analytics"""
     try:
-        analytics = await enhanced_db.get_user_analytics(current_user['user_id'])
+        analytics = await enhanced_db.get_user_analytics(current_user.user_id)
         
         return analytics
         
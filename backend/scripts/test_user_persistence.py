@@ -11,22 +11,35 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from database.user_db import UserDatabase
 from database.enhanced_schema import EnhancedDatabaseManager
 from database.database import DatabaseManager
+from database.connection import open_shared
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_PATH = "./backend/data/metadata.db"
+
 
 async def test_user_persistence():
     """Test user data persistence"""
+    # One connection serves every manager for the normal code paths
+    shared_conn = await open_shared(DB_PATH)
+    try:
+        await _check_persistence(shared_conn)
+    finally:
+        await shared_conn.close()
+
+
+async def _check_persistence(shared_conn):
+    """Run the persistence checks against a shared connection"""
     logger.info("=" * 60)
     logger.info("Testing User Data Persistence")
     logger.info("=" * 60)
     
     # Initialize databases
-    user_db = UserDatabase("./backend/data/metadata.db")
-    enhanced_db = EnhancedDatabaseManager("./backend/data/metadata.db")
-    db_manager = DatabaseManager("sqlite:///./backend/data/metadata.db")
+    user_db = UserDatabase(DB_PATH)
+    enhanced_db = EnhancedDatabaseManager(DB_PATH, conn=shared_conn)
+    db_manager = DatabaseManager(f"sqlite:///{DB_PATH}", conn=shared_conn)
     
     # Test 1: Verify users exist
     logger.info("\n1. Checking existing users...")
@@ -72,18 +85,19 @@ async def test_user_persistence():
         "auto claim procedures",
         "property damage coverage"
     ]
-    for query in searches:
-        await enhanced_db.log_user_search(
-            user_id=user_id,
-            query_text=query,
-            filters={'category': 'Policies'},
-            results_count=5,
-            response_time_ms=150
-        )
+    await enhanced_db.log_user_searches_bulk(user_id, [
+        {
+            'query_text': query,
+            'filters': {'category': 'Policies'},
+            'results_count': 5,
+            'response_time_ms': 150
+        }
+        for query in searches
+    ])
     logger.info(f"✓ Logged {len(searches)} searches")
     
     # Retrieve search history
-    history = await enhanced_db.get_user_search_history(user_id, limit=10)
+    history, _ = await enhanced_db.get_user_search_history(user_id, limit=10)
     logger.info(f"✓ Retrieved {len(history)} search queries:")
     for i, search in enumerate(history[:3], 1):
         logger.info(f"  {i}. {search['query_text']} ({search['timestamp']})")
@@ -96,23 +110,23 @@ async def test_user_persistence():
         doc_id = docs[0].id
         logger.info(f"Using document: {docs[0].filename}")
         
-        await enhanced_db.log_document_access(
-            user_id=user_id,
-            document_id=doc_id,
-            access_type="view",
-            page_number=1,
-            duration_seconds=45
-        )
-        await enhanced_db.log_document_access(
-            user_id=user_id,
-            document_id=doc_id,
-            access_type="download",
-            duration_seconds=5
-        )
+        await enhanced_db.log_document_accesses_bulk(user_id, [
+            {
+                'document_id': doc_id,
+                'access_type': "view",
+                'page_number': 1,
+                'duration_seconds': 45
+            },
+            {
+                'document_id': doc_id,
+                'access_type': "download",
+                'duration_seconds': 5
+            }
+        ])
         logger.info("✓ Document access logged")
         
         # Retrieve access history
-        access_history = await enhanced_db.get_user_document_access_history(user_id, limit=10)
+        access_history, _ = await enhanced_db.get_user_document_access_history(user_id, limit=10)
         logger.info(f"✓ Retrieved {len(access_history)} access records:")
         for i, access in enumerate(access_history[:3], 1):
             logger.info(f"  {i}. {access['access_type']} - {access['filename']} ({access['timestamp']})")
@@ -131,7 +145,7 @@ async def test_user_persistence():
         if success:
             logger.info("✓ Favorite added successfully")
         
-        favorites = await enhanced_db.get_user_favorites(user_id)
+        favorites, _ = await enhanced_db.get_user_favorites(user_id)
         logger.info(f"✓ Retrieved {len(favorites)} favorites:")
         for i, fav in enumerate(favorites, 1):
             logger.info(f"  {i}. {fav['filename']} - {fav['note']}")
@@ -149,15 +163,19 @@ async def test_user_persistence():
     logger.info("\n7. Simulating application reload...")
     logger.info("Creating new database connections...")
     
-    # Create fresh instances
-    user_db_new = UserDatabase("./backend/data/metadata.db")
-    enhanced_db_new = EnhancedDatabaseManager("./backend/data/metadata.db")
+    # Create fresh instances on a second connection
+    reload_conn = await open_shared(DB_PATH)
+    user_db_new = UserDatabase(DB_PATH)
+    enhanced_db_new = EnhancedDatabaseManager(DB_PATH, conn=reload_conn)
     
     # Verify data persists after "reload"
-    test_user_after = await user_db_new.get_user_by_email("shivam.sawant23@vit.edu")
-    prefs_after = await enhanced_db_new.get_user_preferences(user_id)
-    history_after = await enhanced_db_new.get_user_search_history(user_id, limit=10)
-    analytics_after = await enhanced_db_new.get_user_analytics(user_id)
+    try:
+        test_user_after = await user_db_new.get_user_by_email("shivam.sawant23@vit.edu")
+        prefs_after = await enhanced_db_new.get_user_preferences(user_id)
+        history_after, _ = await enhanced_db_new.get_user_search_history(user_id, limit=10)
+        analytics_after = await enhanced_db_new.get_user_analytics(user_id)
+    finally:
+        await reload_conn.close()
     
     if test_user_after and prefs_after and len(history_after) > 0:
         logger.info("✓ All user data persisted after reload!")
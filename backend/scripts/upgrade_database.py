@@ -24,7 +24,11 @@ async def main():
     enhanced_db = EnhancedDatabaseManager("./backend/data/metadata.db")
     
     try:
-        # Run schema upgrade
+        # Run schema upgrade. All DDL runs in a single BEGIN IMMEDIATE ...
+        # COMMIT with foreign_keys OFF, so a failure leaves the schema
+        # untouched. Migrations that must keep FKs enforced should instead use
+        # PRAGMA defer_foreign_keys = ON inside the transaction, which checks
+        # constraints once at COMMIT.
         await enhanced_db.upgrade_schema()
         
         logger.info("✓ Database upgrade completed successfully!")
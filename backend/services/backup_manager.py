@@ -2,22 +2,46 @@
 Backup manager for system data and configurations
 """
 import asyncio
+import hashlib
 import logging
+import os
 import shutil
-import json
+import threading
+import sqlite3
+import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+import tarfile
 import zipfile
 
+import orjson
+import zstandard
+
 logger = logging.getLogger(__name__)
 
+# Archives are zstd-compressed tarballs; older backups may still be .zip
+ARCHIVE_SUFFIX = ".tar.zst"
+LEGACY_SUFFIX = ".zip"
+
+# Worker threads for hashing/storing document files
+DOCUMENT_WORKERS = 32
+
+# Minimum age before an unreferenced object may be garbage collected
+OBJECT_GC_GRACE_SECONDS = 3600
+
 class BackupManager:
     """Manages system backups"""
     
     def __init__(self, backup_path: str = "./data/backups"):
         self.backup_path = Path(backup_path)
         self.backup_path.mkdir(parents=True, exist_ok=True)
+        # Append-only log of manifests; deletes append a tombstone
+        self.index_path = self.backup_path / "index.jsonl"
+        # Content-addressed document store shared by all backups
+        self.objects_path = self.backup_path / "objects"
         
     async def create_backup(self, backup_type: str = "full") -> Dict[str, Any]:
         """
@@ -32,13 +56,10 @@ class BackupManager:
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"backup_{backup_type}_{timestamp}"
-            backup_dir = self.backup_path / backup_name
+            archive_path = self.backup_path / f"{backup_name}{ARCHIVE_SUFFIX}"
             
             logger.info(f"Creating {backup_type} backup: {backup_name}")
             
-            # Create backup directory
-            backup_dir.mkdir(parents=True, exist_ok=True)
-            
             backup_info = {
                 "name": backup_name,
                 "type": backup_type,
@@ -47,34 +68,27 @@ class BackupManager:
                 "files": []
             }
             
-            # Backup database
-            if backup_type in ["full", "database"]:
-                await self._backup_database(backup_dir, backup_info)
-            
-            # Backup documents
-            if backup_type in ["full", "documents"]:
-                await self._backup_documents(backup_dir, backup_info)
-            
-            # Backup settings
-            if backup_type in ["full"]:
-                await self._backup_settings(backup_dir, backup_info)
-            
-            # Create zip archive
-            zip_path = self.backup_path / f"{backup_name}.zip"
-            await self._create_zip(backup_dir, zip_path)
-            
-            # Clean up temporary directory
-            shutil.rmtree(backup_dir)
+            # Sources are streamed straight into the archive - no staging copy
+            async with self._open_archive(archive_path) as archive:
+                # Backup database
+                if backup_type in ["full", "database"]:
+                    await self._backup_database(archive, backup_info)
+                
+                # Backup documents
+                if backup_type in ["full", "documents"]:
+                    await self._backup_documents(archive, backup_info)
+                
+                # Backup settings
+                if backup_type in ["full"]:
+                    await self._backup_settings(archive, backup_info)
             
-            backup_info["archive_path"] = str(zip_path)
-            backup_info["archive_size"] = zip_path.stat().st_size
+            backup_info["archive_path"] = str(archive_path)
+            backup_info["archive_size"] = archive_path.stat().st_size
             
             # Save backup manifest
-            manifest_path = self.backup_path / f"{backup_name}_manifest.json"
-            with open(manifest_path, 'w') as f:
-                json.dump(backup_info, f, indent=2)
+            await asyncio.to_thread(self._write_manifest, backup_info)
             
-            logger.info(f"Backup created successfully: {zip_path}")
+            logger.info(f"Backup created successfully: {archive_path}")
             
             return backup_info
             
@@ -82,32 +96,106 @@ class BackupManager:
             logger.error(f"Backup creation failed: {e}")
             raise
     
-    async def _backup_database(self, backup_dir: Path, backup_info: Dict):
+    @staticmethod
+    @asynccontextmanager
+    async def _open_archive(archive_path: Path) -> AsyncIterator[tarfile.TarFile]:
+        """Open a zstd-compressed tar archive for streaming writes"""
+        # Multi-threaded zstd at level 3 is several times faster than DEFLATE
+        compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+        # The stream writer closes the file when it is closed
+        writer = compressor.stream_writer(open(archive_path, 'wb'))
+        tar = tarfile.open(fileobj=writer, mode='w|')
+        
+        def finish():
+            try:
+                tar.close()
+            finally:
+                writer.close()
+        
+        try:
+            yield tar
+        except Exception:
+            await asyncio.to_thread(finish)
+            archive_path.unlink(missing_ok=True)
+            raise
+        # Closing flushes the remaining compressed frames
+        await asyncio.to_thread(finish)
+    
+    def _write_manifest(self, backup_info: Dict[str, Any]):
+        """Write a backup's manifest file and add it to the index"""
+        manifest_path = self.backup_path / f"{backup_info['name']}_manifest.json"
+        with open(manifest_path, 'wb') as f:
+            f.write(orjson.dumps(backup_info, option=orjson.OPT_INDENT_2))
+        self._append_index(backup_info)
+    
+    async def _backup_database(self, archive: tarfile.TarFile, backup_info: Dict):
         """Backup database files"""
         try:
             db_source = Path("data/metadata.db")
             if db_source.exists():
-                db_dest = backup_dir / "metadata.db"
-                shutil.copy2(db_source, db_dest)
+                started = time.perf_counter()
+                # Snapshot to a file next to the archive and stream that in,
+                # so the database is never held in memory
+                snapshot_path = self.backup_path / f"{backup_info['name']}_metadata.db.tmp"
+                try:
+                    page_count = await asyncio.to_thread(self._snapshot_database, db_source, snapshot_path)
+                    size = snapshot_path.stat().st_size
+                    await asyncio.to_thread(archive.add, str(snapshot_path), "metadata.db")
+                finally:
+                    snapshot_path.unlink(missing_ok=True)
+                
                 backup_info["files"].append({
                     "type": "database",
                     "source": str(db_source),
-                    "size": db_source.stat().st_size
+                    "size": size,
+                    "page_count": page_count,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1)
                 })
                 logger.info("Database backed up")
         except Exception as e:
             logger.error(f"Database backup failed: {e}")
     
-    async def _backup_documents(self, backup_dir: Path, backup_info: Dict):
+    @staticmethod
+    def _snapshot_database(source: Path, dest: Path) -> int:
+        """Write a consistent copy of a live SQLite database to dest; returns its page count
+        
+        Uses SQLite's online backup API, so writers can keep going and the
+        WAL is folded into the copy.
+        """
+        dest.unlink(missing_ok=True)
+        src = sqlite3.connect(str(source))
+        dst = sqlite3.connect(str(dest))
+        try:
+            src.backup(dst, pages=1024, sleep=0.001)
+            return dst.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            dst.close()
+            src.close()
+    
+    async def _backup_documents(self, archive: tarfile.TarFile, backup_info: Dict):
         """Backup document files"""
         try:
             docs_source = Path("data/documents")
-            if docs_source.exists():
-                docs_dest = backup_dir / "documents"
-                shutil.copytree(docs_source, docs_dest, dirs_exist_ok=True)
+            files = await asyncio.to_thread(self._scan_documents, docs_source)
+            if files is not None:
+                # Unchanged documents are already in the object store
+                loop = asyncio.get_running_loop()
+                with ThreadPoolExecutor(max_workers=DOCUMENT_WORKERS) as pool:
+                    digests = await asyncio.gather(*[
+                        loop.run_in_executor(pool, self._put_object, path)
+                        for path in files
+                    ])
                 
-                # Count files
-                file_count = len(list(docs_dest.rglob("*")))
+                # Per-document references are stored column-wise: one list
+                # per field instead of a dict per file
+                hashes, sizes = zip(*digests) if digests else ((), ())
+                backup_info["documents"] = {
+                    "source": [str(path.relative_to(docs_source)) for path in files],
+                    "size": list(sizes),
+                    "sha256": list(hashes)
+                }
+                
+                file_count = len(files)
                 backup_info["files"].append({
                     "type": "documents",
                     "source": str(docs_source),
@@ -117,7 +205,85 @@ class BackupManager:
         except Exception as e:
             logger.error(f"Documents backup failed: {e}")
     
-    async def _backup_settings(self, backup_dir: Path, backup_info: Dict):
+    def _scan_documents(self, docs_source: Path) -> Optional[List[Path]]:
+        """Every file under docs_source, or None if it doesn't exist; blocking"""
+        if not docs_source.exists():
+            return None
+        self.objects_path.mkdir(exist_ok=True)
+        return [
+            Path(root) / name
+            for root, _, names in os.walk(docs_source)
+            for name in names
+        ]
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_path / f"{digest}.zst"
+    
+    def _put_object(self, path: Path) -> Tuple[str, int]:
+        """Store a file in the object store; returns its SHA-256 and size"""
+        with open(path, 'rb') as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+            size = f.tell()
+        
+        obj_path = self._object_path(digest)
+        if not obj_path.exists():
+            tmp_path = obj_path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+            tmp_path.replace(obj_path)
+        
+        return digest, size
+    
+    def _restore_objects(self, backup_name: str) -> int:
+        """Rebuild data/documents from a backup's object references"""
+        manifest_path = self.backup_path / f"{backup_name}_manifest.json"
+        if not manifest_path.exists():
+            return 0
+        with open(manifest_path, 'rb') as f:
+            backup_info = orjson.loads(f.read())
+        
+        docs_dest = Path("data/documents")
+        decompressor = zstandard.ZstdDecompressor()
+        restored = 0
+        documents = backup_info.get("documents", {})
+        for source, digest in zip(documents.get("source", []), documents.get("sha256", [])):
+            # Backups from before the object store keep documents in the archive
+            obj_path = self._object_path(digest)
+            if not obj_path.exists():
+                continue
+            
+            dest = docs_dest / source
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with open(obj_path, 'rb') as src, open(dest, 'wb') as dst:
+                decompressor.copy_stream(src, dst)
+            restored += 1
+        return restored
+    
+    def _collect_garbage(self) -> int:
+        """Delete objects that no remaining manifest references"""
+        if not self.objects_path.exists():
+            return 0
+        
+        entries, _ = self._read_index()
+        live = {
+            digest
+            for backup_info in entries.values()
+            for digest in backup_info.get("documents", {}).get("sha256", [])
+        }
+        
+        # Leave recent objects alone - a backup in progress may not have
+        # written its manifest yet
+        cutoff = time.time() - OBJECT_GC_GRACE_SECONDS
+        removed = 0
+        for obj_path in self.objects_path.iterdir():
+            digest = obj_path.name.split(".", 1)[0]
+            if digest in live or obj_path.stat().st_mtime > cutoff:
+                continue
+            obj_path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+    
+    async def _backup_settings(self, archive: tarfile.TarFile, backup_info: Dict):
         """Backup configuration and settings"""
         try:
             settings_files = [
@@ -126,43 +292,89 @@ class BackupManager:
                 Path("backend/config/settings.py")
             ]
             
-            settings_dir = backup_dir / "settings"
-            settings_dir.mkdir(exist_ok=True)
-            
+            file_count = 0
             for source in settings_files:
                 if source.exists():
-                    dest = settings_dir / source.name
-                    shutil.copy2(source, dest)
+                    await asyncio.to_thread(archive.add, source, arcname=f"settings/{source.name}")
+                    file_count += 1
             
             backup_info["files"].append({
                 "type": "settings",
-                "file_count": len(list(settings_dir.glob("*")))
+                "file_count": file_count
             })
             logger.info("Settings backed up")
         except Exception as e:
             logger.error(f"Settings backup failed: {e}")
     
-    async def _create_zip(self, source_dir: Path, zip_path: Path):
-        """Create zip archive of backup"""
-        try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file in source_dir.rglob("*"):
-                    if file.is_file():
-                        arcname = file.relative_to(source_dir)
-                        zipf.write(file, arcname)
-            logger.info(f"Zip archive created: {zip_path}")
-        except Exception as e:
-            logger.error(f"Zip creation failed: {e}")
-            raise
+    def _find_archive(self, backup_name: str) -> Optional[Path]:
+        """Locate a backup's archive, falling back to the legacy zip format"""
+        for suffix in (ARCHIVE_SUFFIX, LEGACY_SUFFIX):
+            path = self.backup_path / f"{backup_name}{suffix}"
+            if path.exists():
+                return path
+        return None
+    
+    def _extract_archive(self, archive_path: Path, dest_dir: Path):
+        """Extract a backup archive into dest_dir"""
+        if archive_path.name.endswith(LEGACY_SUFFIX):
+            with zipfile.ZipFile(archive_path, 'r') as zipf:
+                zipf.extractall(dest_dir)
+            return
+        
+        decompressor = zstandard.ZstdDecompressor()
+        with open(archive_path, 'rb') as raw, \
+                decompressor.stream_reader(raw) as reader, \
+                tarfile.open(fileobj=reader, mode='r|') as tar:
+            tar.extractall(dest_dir, filter='data')
+    
+    def _append_index(self, entry: Dict[str, Any]):
+        """Append one manifest or tombstone to the backup index"""
+        if not self.index_path.exists():
+            # First write since the index was introduced - seed it from disk
+            self._rebuild_index()
+        with open(self.index_path, 'ab') as f:
+            f.write(orjson.dumps(entry) + b"\n")
+    
+    def _read_index(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """Return live manifests by name and the number of lines in the index"""
+        if not self.index_path.exists():
+            self._rebuild_index()
+        
+        entries: Dict[str, Dict[str, Any]] = {}
+        line_count = 0
+        with open(self.index_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                line_count += 1
+                entry = orjson.loads(line)
+                if entry.get("deleted"):
+                    entries.pop(entry["name"], None)
+                else:
+                    entries[entry["name"]] = entry
+        return entries, line_count
+    
+    def _write_index(self, entries: List[Dict[str, Any]]):
+        """Rewrite the index with just the given manifests"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            for entry in entries:
+                f.write(orjson.dumps(entry) + b"\n")
+        tmp_path.replace(self.index_path)
+    
+    def _rebuild_index(self):
+        """Recreate the index from the manifest files"""
+        entries = []
+        for manifest_file in self.backup_path.glob("*_manifest.json"):
+            with open(manifest_file, 'rb') as f:
+                entries.append(orjson.loads(f.read()))
+        self._write_index(entries)
     
     async def list_backups(self) -> list:
         """List all available backups"""
         try:
-            backups = []
-            for manifest_file in self.backup_path.glob("*_manifest.json"):
-                with open(manifest_file, 'r') as f:
-                    backup_info = json.load(f)
-                    backups.append(backup_info)
+            entries, _ = await asyncio.to_thread(self._read_index)
+            backups = list(entries.values())
             
             # Sort by timestamp (newest first)
             backups.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -183,41 +395,14 @@ class BackupManager:
             True if successful
         """
         try:
-            zip_path = self.backup_path / f"{backup_name}.zip"
+            archive_path = self._find_archive(backup_name)
             
-            if not zip_path.exists():
+            if archive_path is None:
                 raise FileNotFoundError(f"Backup not found: {backup_name}")
             
             logger.info(f"Restoring backup: {backup_name}")
             
-            # Create temporary extraction directory
-            temp_dir = self.backup_path / "temp_restore"
-            temp_dir.mkdir(exist_ok=True)
-            
-            # Extract zip
-            with zipfile.ZipFile(zip_path, 'r') as zipf:
-                zipf.extractall(temp_dir)
-            
-            # Restore database
-            db_backup = temp_dir / "metadata.db"
-            if db_backup.exists():
-                shutil.copy2(db_backup, "data/metadata.db")
-                logger.info("Database restored")
-            
-            # Restore documents
-            docs_backup = temp_dir / "documents"
-            if docs_backup.exists():
-                shutil.copytree(docs_backup, "data/documents", dirs_exist_ok=True)
-                logger.info("Documents restored")
-            
-            # Restore settings
-            settings_backup = temp_dir / "settings" / "user_settings.json"
-            if settings_backup.exists():
-                shutil.copy2(settings_backup, "data/user_settings.json")
-                logger.info("Settings restored")
-            
-            # Clean up
-            shutil.rmtree(temp_dir)
+            await asyncio.to_thread(self._restore_files, backup_name, archive_path)
             
             logger.info(f"Backup restored successfully: {backup_name}")
             return True
@@ -226,16 +411,44 @@ class BackupManager:
             logger.error(f"Backup restore failed: {e}")
             return False
     
+    def _restore_files(self, backup_name: str, archive_path: Path):
+        """Copy a backup's contents back into place (blocking)"""
+        # Create temporary extraction directory
+        temp_dir = self.backup_path / "temp_restore"
+        temp_dir.mkdir(exist_ok=True)
+        
+        # Extract archive
+        self._extract_archive(archive_path, temp_dir)
+        
+        # Restore database
+        db_backup = temp_dir / "metadata.db"
+        if db_backup.exists():
+            shutil.copy2(db_backup, "data/metadata.db")
+            logger.info("Database restored")
+        
+        # Restore documents
+        docs_backup = temp_dir / "documents"
+        if docs_backup.exists():
+            shutil.copytree(docs_backup, "data/documents", dirs_exist_ok=True)
+            logger.info("Documents restored")
+        
+        restored = self._restore_objects(backup_name)
+        if restored:
+            logger.info(f"Documents restored from object store: {restored} files")
+        
+        # Restore settings
+        settings_backup = temp_dir / "settings" / "user_settings.json"
+        if settings_backup.exists():
+            shutil.copy2(settings_backup, "data/user_settings.json")
+            logger.info("Settings restored")
+        
+        # Clean up
+        shutil.rmtree(temp_dir)
+    
     async def delete_backup(self, backup_name: str) -> bool:
         """Delete a backup"""
         try:
-            zip_path = self.backup_path / f"{backup_name}.zip"
-            manifest_path = self.backup_path / f"{backup_name}_manifest.json"
-            
-            if zip_path.exists():
-                zip_path.unlink()
-            if manifest_path.exists():
-                manifest_path.unlink()
+            await asyncio.to_thread(self._delete_files, backup_name)
             
             logger.info(f"Backup deleted: {backup_name}")
             return True
@@ -243,19 +456,76 @@ class BackupManager:
             logger.error(f"Failed to delete backup: {e}")
             return False
     
+    def _delete_files(self, backup_name: str):
+        """Remove a backup's archive and manifest and tombstone it (blocking)"""
+        archive_path = self._find_archive(backup_name)
+        manifest_path = self.backup_path / f"{backup_name}_manifest.json"
+        
+        if archive_path is not None:
+            archive_path.unlink()
+        if manifest_path.exists():
+            manifest_path.unlink()
+        
+        self._append_index({"name": backup_name, "deleted": True})
+        
+        # Compact once tombstones and superseded lines pass 20% of the index
+        entries, line_count = self._read_index()
+        if line_count - len(entries) > 0.2 * line_count:
+            self._write_index(list(entries.values()))
+    
     async def cleanup_old_backups(self, keep_count: int = 10):
         """Keep only the most recent N backups"""
         try:
-            backups = await self.list_backups()
+            deleted = await asyncio.to_thread(self._sweep_old_backups, keep_count)
+            if deleted:
+                logger.info(f"Cleaned up {deleted} old backups")
             
-            if len(backups) > keep_count:
-                to_delete = backups[keep_count:]
-                for backup in to_delete:
-                    await self.delete_backup(backup['name'])
-                
-                logger.info(f"Cleaned up {len(to_delete)} old backups")
+            removed = await asyncio.to_thread(self._collect_garbage)
+            if removed:
+                logger.info(f"Removed {removed} unreferenced backup objects")
         except Exception as e:
             logger.error(f"Backup cleanup failed: {e}")
+    
+    def _sweep_old_backups(self, keep_count: int) -> int:
+        """Delete all but the newest keep_count backups in one directory scan"""
+        # name -> (newest mtime, files) for archives and manifests, so
+        # orphaned archives or manifests are swept too
+        backups: Dict[str, Tuple[float, List[str]]] = {}
+        with os.scandir(self.backup_path) as it:
+            for entry in it:
+                for suffix in (ARCHIVE_SUFFIX, LEGACY_SUFFIX, "_manifest.json"):
+                    if entry.name.endswith(suffix) and entry.is_file():
+                        name = entry.name[:-len(suffix)]
+                        mtime, files = backups.get(name, (0.0, []))
+                        files.append(entry.path)
+                        backups[name] = (max(mtime, entry.stat().st_mtime), files)
+                        break
+        
+        if len(backups) <= keep_count:
+            return 0
+        
+        by_age = sorted(backups.items(), key=lambda item: item[1][0], reverse=True)
+        victims = by_age[keep_count:]
+        for _, (_, files) in victims:
+            for path in files:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        
+        # Tombstone every victim with one append, then compact if needed
+        if not self.index_path.exists():
+            self._rebuild_index()
+        with open(self.index_path, 'ab') as f:
+            f.write(b"".join(
+                orjson.dumps({"name": name, "deleted": True}) + b"\n"
+                for name, _ in victims
+            ))
+        entries, line_count = self._read_index()
+        if line_count - len(entries) > 0.2 * line_count:
+            self._write_index(list(entries.values()))
+        
+        return len(victims)
 
 # Global backup manager instance
 backup_manager = BackupManager()
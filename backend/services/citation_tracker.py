@@ -3,9 +3,15 @@ Citation and provenance tracking service for maintaining document references
 """
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import time
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, NamedTuple, Optional, Tuple
 from datetime import datetime
 import hashlib
+import numpy as np
 
 from models.schemas import Citation, DocumentChunk, DocumentMetadata
 from database.database import DatabaseManager
@@ -13,11 +19,73 @@ from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Short-lived cache for repeated document/page citation lookups
+CITATION_CACHE_TTL = 30  # seconds
+CITATION_CACHE_SIZE = 1024
+
+# How long system-wide citation stats are served from memory
+CITATION_STATS_TTL = 60  # seconds
+
+# Chunk count above which content hashing is spread over a thread pool
+PARALLEL_HASH_THRESHOLD = 256
+
+def _blake2b_hex(content: str, _blake2b=hashlib.blake2b) -> str:
+    return _blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+def _md5_hex(content: str, _md5=hashlib.md5) -> str:
+    return _md5(content.encode('utf-8')).hexdigest()
+
+def content_hasher() -> Callable[[str], str]:
+    """Chunk content hash function selected by settings (128-bit hex digest)"""
+    return _md5_hex if settings.citation_hash_algorithm == "md5" else _blake2b_hex
+
+def compute_content_hash(content: str) -> str:
+    """128-bit hex digest of chunk content used for citation integrity"""
+    return content_hasher()(content)
+
+@lru_cache(maxsize=256)
+def _parse_ts(value: str) -> datetime:
+    """Parse a stored timestamp; citations from one ingest share the same value"""
+    return datetime.fromisoformat(value)
+
+class _CitationRow(NamedTuple):
+    """Lightweight citation record used while creating and storing citations"""
+    chunk_id: str
+    document_id: str
+    document_title: str
+    page_number: int
+    paragraph_number: Optional[int]
+    section_title: Optional[str]
+    url: str
+    last_updated: datetime
+    content_hash: str
+    
+    def to_citation(self) -> Citation:
+        return Citation(
+            document_id=self.document_id,
+            document_title=self.document_title,
+            page_number=self.page_number,
+            paragraph_number=self.paragraph_number,
+            section_title=self.section_title,
+            url=self.url,
+            last_updated=self.last_updated
+        )
+
 class CitationTracker:
     """Service for creating and managing document citations"""
     
     def __init__(self):
         self.db_manager = None
+        # (document_id, page_number) -> (expires_at, citations)
+        self._citation_cache: "OrderedDict[Tuple[str, Optional[int]], Tuple[float, List[Citation]]]" = OrderedDict()
+        # (expires_at, stats) for get_citation_stats
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        
+    def _invalidate_citations(self, document_id: str):
+        """Drop cached citation lookups for a document, and the cached stats"""
+        self._stats_cache = None
+        for key in [key for key in self._citation_cache if key[0] == document_id]:
+            del self._citation_cache[key]
         
     async def initialize(self, db_manager: DatabaseManager):
         """Initialize with database manager"""
@@ -52,92 +120,111 @@ class CitationTracker:
     async def create_citations(self, document_data: Dict[str, Any]) -> List[Citation]:
         """Create citations for all chunks in a document"""
         try:
-            citations = []
             document_id = document_data['id']
             metadata = document_data['metadata']
             chunks = document_data['chunks']
             
             document_title = metadata.get('filename', 'Unknown Document')
             
-            for chunk in chunks:
-                citation = await self._create_chunk_citation(
-                    chunk, 
-                    document_id, 
-                    document_title
-                )
-                
-                if citation:
-                    citations.append(citation)
-                    
+            # Shared by every chunk's direct URL
+            url_prefix = f"/documents/{document_id}/page/"
+            
+            # Hash every chunk off the event loop in one go
+            content_hashes = await asyncio.to_thread(self._hash_chunks_bulk, chunks)
+            
+            rows = [
+                self._create_chunk_citation(chunk, document_id, document_title, content_hash, url_prefix)
+                for chunk, content_hash in zip(chunks, content_hashes)
+            ]
+            
             # Store citations in database
-            await self._store_citations(citations)
+            await self._store_citations(rows)
+            self._invalidate_citations(document_id)
             
-            logger.info(f"Created {len(citations)} citations for document {document_id}")
-            return citations
+            logger.info(f"Created {len(rows)} citations for document {document_id}")
+            return [row.to_citation() for row in rows]
             
         except Exception as e:
             logger.error(f"Citation creation failed for document {document_id}: {e}")
             raise
             
-    async def _create_chunk_citation(
-        self, 
+    @staticmethod
+    def _hash_chunks_bulk(chunks: List[DocumentChunk]) -> List[str]:
+        """Content hashes for a list of chunks, in order"""
+        # Resolve the hash function once for the batch, not per chunk
+        hash_content = content_hasher()
+        contents = [chunk.content for chunk in chunks]
+        if len(contents) < PARALLEL_HASH_THRESHOLD:
+            return list(map(hash_content, contents))
+        
+        # hashlib releases the GIL on large inputs, so threads use every core
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            return list(pool.map(hash_content, contents, chunksize=64))
+    
+    @staticmethod
+    def _create_chunk_citation(
         chunk: DocumentChunk, 
         document_id: str,
-        document_title: str
-    ) -> Optional[Citation]:
+        document_title: str,
+        content_hash: str,
+        url_prefix: str
+    ) -> _CitationRow:
         """Create citation for a single chunk"""
-        try:
-            # Generate content hash for integrity
-            content_hash = hashlib.md5(chunk.content.encode()).hexdigest()
-            
-            # Create direct URL to chunk
-            direct_url = f"/documents/{document_id}/page/{chunk.page_number}"
-            if chunk.paragraph_number:
-                direct_url += f"/paragraph/{chunk.paragraph_number}"
-                
-            citation = Citation(
-                document_id=document_id,
-                document_title=document_title,
-                page_number=chunk.page_number,
-                paragraph_number=chunk.paragraph_number,
-                section_title=chunk.section_title,
-                url=direct_url,
-                last_updated=datetime.now()
-            )
-            
-            # Store citation metadata for database
-            citation._content_hash = content_hash
-            citation._chunk_id = chunk.id
-            
-            return citation
-            
-        except Exception as e:
-            logger.error(f"Failed to create citation for chunk {chunk.id}: {e}")
-            return None
-            
-    async def _store_citations(self, citations: List[Citation]):
+        # Create direct URL to chunk
+        direct_url = url_prefix + str(chunk.page_number)
+        if chunk.paragraph_number:
+            direct_url += f"/paragraph/{chunk.paragraph_number}"
+            
+        return _CitationRow(
+            chunk_id=chunk.id,
+            document_id=document_id,
+            document_title=document_title,
+            page_number=chunk.page_number,
+            paragraph_number=chunk.paragraph_number,
+            section_title=chunk.section_title,
+            url=direct_url,
+            last_updated=datetime.now(),
+            content_hash=content_hash
+        )
+            
+    async def _store_citations(self, rows: List[_CitationRow]):
         """Store citations in database"""
         try:
-            for citation in citations:
-                citation_data = {
-                    'id': getattr(citation, '_chunk_id'),
-                    'document_id': citation.document_id,
-                    'document_title': citation.document_title,
-                    'page_number': citation.page_number,
-                    'paragraph_number': citation.paragraph_number,
-                    'section_title': citation.section_title or '',
-                    'content_hash': getattr(citation, '_content_hash'),
-                    'direct_url': citation.url,
-                    'created_at': citation.last_updated.isoformat(),
-                    'updated_at': citation.last_updated.isoformat()
+            citation_rows = [
+                {
+                    'id': row.chunk_id,
+                    'document_id': row.document_id,
+                    'document_title': row.document_title,
+                    'page_number': row.page_number,
+                    'paragraph_number': row.paragraph_number,
+                    'section_title': row.section_title or '',
+                    'content_hash': row.content_hash,
+                    'direct_url': row.url,
+                    'created_at': row.last_updated.isoformat(),
+                    'updated_at': row.last_updated.isoformat()
                 }
-                
-                await self.db_manager.upsert_citation(citation_data)
-                
+                for row in rows
+            ]
+            
+            await self.db_manager.upsert_citations_bulk(citation_rows)
+            
         except Exception as e:
             logger.error(f"Failed to store citations: {e}")
             raise
             
+    @staticmethod
+    def _citation_from_record(record: Dict[str, Any]) -> Citation:
+        """Build a Citation from a citations table row"""
+        return Citation(
+            document_id=record['document_id'],
+            document_title=record['document_title'],
+            page_number=record['page_number'],
+            paragraph_number=record.get('paragraph_number'),
+            section_title=record.get('section_title'),
+            url=record.get('direct_url'),
+            last_updated=_parse_ts(record['updated_at'])
+        )
+        
     async def get_citations(
         self, 
         document_id: str,
@@ -145,6 +232,15 @@ class CitationTracker:
         paragraph_number: Optional[int] = None
     ) -> List[Citation]:
         """Retrieve citations for document/page/paragraph"""
+        # Paragraph lookups rarely repeat, so only document/page results are cached
+        cache_key = None
+        if paragraph_number is None:
+            cache_key = (document_id, page_number)
+            cached = self._citation_cache.get(cache_key)
+            if cached and cached[0] > time.monotonic():
+                self._citation_cache.move_to_end(cache_key)
+                return list(cached[1])
+        
         try:
             filters = {'document_id': document_id}
             
@@ -156,20 +252,15 @@ class CitationTracker:
                 
             citation_records = await self.db_manager.get_citations(filters)
             
-            citations = []
-            for record in citation_records:
-                citation = Citation(
-                    document_id=record['document_id'],
-                    document_title=record['document_title'],
-                    page_number=record['page_number'],
-                    paragraph_number=record.get('paragraph_number'),
-                    section_title=record.get('section_title'),
-                    url=record.get('direct_url'),
-                    last_updated=datetime.fromisoformat(record['updated_at'])
-                )
-                citations.append(citation)
+            citations = [self._citation_from_record(record) for record in citation_records]
+            
+            if cache_key is not None:
+                self._citation_cache[cache_key] = (time.monotonic() + CITATION_CACHE_TTL, citations)
+                self._citation_cache.move_to_end(cache_key)
+                if len(self._citation_cache) > CITATION_CACHE_SIZE:
+                    self._citation_cache.popitem(last=False)
                 
-            return citations
+            return list(citations)
             
         except Exception as e:
             logger.error(f"Failed to retrieve citations for {document_id}: {e}")
@@ -181,16 +272,7 @@ class CitationTracker:
             records = await self.db_manager.get_citations({'content_hash': content_hash})
             
             if records:
-                record = records[0]
-                return Citation(
-                    document_id=record['document_id'],
-                    document_title=record['document_title'],
-                    page_number=record['page_number'],
-                    paragraph_number=record.get('paragraph_number'),
-                    section_title=record.get('section_title'),
-                    url=record.get('direct_url'),
-                    last_updated=datetime.fromisoformat(record['updated_at'])
-                )
+                return self._citation_from_record(records[0])
                 
             return None
             
@@ -201,52 +283,49 @@ class CitationTracker:
     async def update_citation_urls(self, document_id: str, new_base_url: str):
         """Update citation URLs when document location changes"""
         try:
-            citations = await self.get_citations(document_id)
+            updated_count = await self.db_manager.rewrite_citation_urls(
+                document_id,
+                f"/documents/{document_id}",
+                new_base_url
+            )
+            self._invalidate_citations(document_id)
             
-            for citation in citations:
-                # Update URL
-                old_url = citation.url
-                citation.url = old_url.replace(f"/documents/{document_id}", new_base_url)
-                
-                # Update in database
-                await self.db_manager.update_citation_url(
-                    document_id, 
-                    citation.page_number,
-                    citation.paragraph_number,
-                    citation.url
-                )
-                
-            logger.info(f"Updated {len(citations)} citation URLs for document {document_id}")
+            logger.info(f"Updated {updated_count} citation URLs for document {document_id}")
+            return updated_count
             
         except Exception as e:
             logger.error(f"Failed to update citation URLs for {document_id}: {e}")
             raise
             
+    async def _integrity_from_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """Integrity report over column arrays from get_citation_columns"""
+        document_ids = columns['document_id']
+        
+        # Check that every referenced document still exists, in one lookup
+        existing_ids = await self.db_manager.existing_document_ids(np.unique(document_ids).tolist())
+        valid = np.isin(document_ids, list(existing_ids))
+        invalid_rows = np.flatnonzero(~valid)
+        
+        return {
+            'total_citations': len(document_ids),
+            'valid_citations': int(np.count_nonzero(valid)),
+            'invalid_citations': len(invalid_rows),
+            'missing_content': [
+                {
+                    'page': int(columns['page_number'][i]),
+                    'paragraph': columns['paragraph_number'][i],
+                    'url': columns['direct_url'][i]
+                }
+                for i in invalid_rows
+            ],
+            'hash_mismatches': []
+        }
+        
     async def verify_citation_integrity(self, document_id: str) -> Dict[str, Any]:
         """Verify that citations point to existing content"""
         try:
-            citations = await self.get_citations(document_id)
-            integrity_report = {
-                'total_citations': len(citations),
-                'valid_citations': 0,
-                'invalid_citations': 0,
-                'missing_content': [],
-                'hash_mismatches': []
-            }
-            
-            for citation in citations:
-                # Check if referenced content still exists
-                is_valid = await self._verify_citation_content(citation)
-                
-                if is_valid:
-                    integrity_report['valid_citations'] += 1
-                else:
-                    integrity_report['invalid_citations'] += 1
-                    integrity_report['missing_content'].append({
-                        'page': citation.page_number,
-                        'paragraph': citation.paragraph_number,
-                        'url': citation.url
-                    })
+            columns = await self.db_manager.get_citation_columns(document_id)
+            integrity_report = await self._integrity_from_columns(columns)
                     
             logger.info(f"Citation integrity check for {document_id}: {integrity_report['valid_citations']}/{integrity_report['total_citations']} valid")
             return integrity_report
@@ -255,52 +334,47 @@ class CitationTracker:
             logger.error(f"Citation integrity check failed for {document_id}: {e}")
             return {'error': str(e)}
             
-    async def _verify_citation_content(self, citation: Citation) -> bool:
-        """Verify that a citation points to existing content"""
-        try:
-            # Check if the document still exists
-            document_exists = await self.db_manager.document_exists(citation.document_id)
-            if not document_exists:
-                return False
-                
-            # Additional verification could be added here
-            # such as checking file existence, content hash verification, etc.
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Citation verification failed: {e}")
-            return False
-            
     async def remove_citations(self, document_id: str):
         """Remove all citations for a document"""
+        return await self.remove_citations_bulk([document_id])
+        
+    async def remove_citations_bulk(self, document_ids: List[str]) -> int:
+        """Remove all citations for several documents in one statement"""
         try:
             # Check if db_manager is initialized
             if self.db_manager is None:
-                logger.warning(f"Database manager not initialized, skipping citation removal for {document_id}")
+                logger.warning(f"Database manager not initialized, skipping citation removal for {document_ids}")
                 return 0
             
-            deleted_count = await self.db_manager.delete_citations(document_id)
-            logger.info(f"Removed {deleted_count} citations for document {document_id}")
+            deleted_count = await self.db_manager.delete_citations_bulk(document_ids)
+            for document_id in document_ids:
+                self._invalidate_citations(document_id)
+            logger.info(f"Removed {deleted_count} citations for {len(document_ids)} document(s)")
             return deleted_count
             
         except Exception as e:
-            logger.error(f"Failed to remove citations for {document_id}: {e}")
+            logger.error(f"Failed to remove citations for {document_ids}: {e}")
             # Don't raise, just log - allow deletion to continue
             return 0
             
     async def get_citation_stats(self) -> Dict[str, Any]:
         """Get statistics about citations in the system"""
+        if self._stats_cache is not None and self._stats_cache[0] > time.monotonic():
+            return dict(self._stats_cache[1])
+            
         try:
             stats = await self.db_manager.get_citation_stats()
             
-            return {
+            citation_stats = {
                 'total_citations': stats.get('total_citations', 0),
                 'documents_with_citations': stats.get('documents_with_citations', 0),
                 'avg_citations_per_document': stats.get('avg_citations_per_document', 0),
                 'citations_by_document_type': stats.get('by_document_type', {}),
                 'recent_citations': stats.get('recent_citations', 0)
             }
+            self._stats_cache = (time.monotonic() + CITATION_STATS_TTL, citation_stats)
+            
+            return dict(citation_stats)
             
         except Exception as e:
             logger.error(f"Failed to get citation stats: {e}")
@@ -313,39 +387,13 @@ class CitationTracker:
     ) -> List[Citation]:
         """Find citations related to the given citation"""
         try:
-            related_citations = []
-            
-            # Find citations from same document
-            same_doc_citations = await self.get_citations(citation.document_id)
-            
-            # Find nearby pages
-            nearby_citations = [
-                c for c in same_doc_citations 
-                if abs(c.page_number - citation.page_number) <= 2
-                and c.page_number != citation.page_number
-            ]
-            
-            related_citations.extend(nearby_citations[:limit//2])
-            
-            # Find citations with similar section titles
-            if citation.section_title:
-                section_citations = await self.db_manager.find_citations_by_section(
-                    citation.section_title,
-                    exclude_document=citation.document_id
-                )
-                related_citations.extend(section_citations[:limit//2])
-                
-            # Remove duplicates and limit results
-            seen_citations = set()
-            unique_citations = []
-            
-            for rel_citation in related_citations:
-                citation_key = f"{rel_citation.document_id}_{rel_citation.page_number}_{rel_citation.paragraph_number}"
-                if citation_key not in seen_citations:
-                    seen_citations.add(citation_key)
-                    unique_citations.append(rel_citation)
-                    
-            return unique_citations[:limit]
+            records = await self.db_manager.find_related_citations(
+                citation.document_id,
+                citation.page_number,
+                citation.section_title,
+                limit
+            )
+            return [self._citation_from_record(record) for record in records]
             
         except Exception as e:
             logger.error(f"Failed to find related citations: {e}")
@@ -354,33 +402,27 @@ class CitationTracker:
     async def generate_citation_report(self, document_id: str) -> Dict[str, Any]:
         """Generate comprehensive citation report for a document"""
         try:
-            citations = await self.get_citations(document_id)
-            integrity_check = await self.verify_citation_integrity(document_id)
+            columns = await self.db_manager.get_citation_columns(document_id)
+            integrity_check = await self._integrity_from_columns(columns)
+            total_citations = integrity_check['total_citations']
             
             # Analyze citation patterns
-            page_distribution = {}
-            section_distribution = {}
+            pages, page_counts = np.unique(columns['page_number'], return_counts=True)
+            page_distribution = dict(zip(pages.tolist(), page_counts.tolist()))
+            sections = columns['section_title']
+            sections, section_counts = np.unique(sections[sections.astype(bool)], return_counts=True)
+            section_distribution = dict(zip(sections.tolist(), section_counts.tolist()))
             
-            for citation in citations:
-                # Page distribution
-                page_num = citation.page_number
-                page_distribution[page_num] = page_distribution.get(page_num, 0) + 1
-                
-                # Section distribution
-                if citation.section_title:
-                    section = citation.section_title
-                    section_distribution[section] = section_distribution.get(section, 0) + 1
-                    
             report = {
                 'document_id': document_id,
-                'total_citations': len(citations),
+                'total_citations': total_citations,
                 'page_distribution': page_distribution,
                 'section_distribution': section_distribution,
                 'integrity_check': integrity_check,
                 'coverage': {
                     'pages_with_citations': len(page_distribution),
                     'sections_with_citations': len(section_distribution),
-                    'avg_citations_per_page': len(citations) / max(len(page_distribution), 1)
+                    'avg_citations_per_page': total_citations / max(len(page_distribution), 1)
                 },
                 'generated_at': datetime.now().isoformat()
             }
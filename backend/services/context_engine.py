@@ -4,7 +4,11 @@ Context-aware suggestion engine for analyzing case data and generating intellige
 import re
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 from datetime import datetime
 import json
 
@@ -13,185 +17,275 @@ from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+_WORD_RE = re.compile(r'\b\w+\b')
+_SPLIT_RE = re.compile(r'[,;\-_\s]+')
+
+CASE_TYPE_PATTERNS = {
+    'flood': ['flood', 'water damage', 'hurricane', 'storm damage', 'flooding'],
+    'auto': ['auto', 'car', 'vehicle', 'collision', 'accident', 'automotive'],
+    'property': ['property', 'home', 'house', 'dwelling', 'homeowner'],
+    'liability': ['liability', 'personal injury', 'bodily injury', 'property damage'],
+    'workers_comp': ['workers compensation', 'work injury', 'workplace', 'employee'],
+    'health': ['health', 'medical', 'healthcare', 'treatment', 'hospital'],
+    'life': ['life insurance', 'death benefit', 'beneficiary', 'mortality'],
+    'disability': ['disability', 'impairment', 'unable to work', 'incapacitated']
+}
+
+STATE_SPECIFIC_TERMS = {
+    'florida': ['florida statute', 'fl law', 'hurricane coverage', 'windstorm'],
+    'california': ['california code', 'ca regulation', 'earthquake', 'wildfire'],
+    'texas': ['texas law', 'tx statute', 'hail damage', 'tornado'],
+    'new_york': ['new york law', 'ny regulation', 'no-fault', 'pip coverage'],
+    'illinois': ['illinois law', 'il statute', 'comparative fault']
+}
+
+PRIORITY_WEIGHTS = {
+    'high': 1.5,
+    'urgent': 2.0,
+    'critical': 2.5,
+    'medium': 1.0,
+    'low': 0.8
+}
+
+_STATUS_URGENCY = {
+    'pending review': 1.3,
+    'investigation': 1.5,
+    'dispute': 1.8,
+    'legal review': 2.0,
+    'appeal': 1.9
+}
+
+# Bucket bounds for bisect: the label/multiplier at index bisect(bounds, x)
+_AGE_BUCKETS = (7, 30, 90)  # days, inclusive upper bounds
+_AGE_LABELS = ('new', 'recent', 'mature', 'aged')
+_AMOUNT_BUCKETS = (5000, 25000, 100000)  # exclusive upper bounds
+_AMOUNT_LABELS = ('small', 'medium', 'large', 'major')
+_AGE_URGENCY_BUCKETS = (14, 30)  # older cases get higher priority
+_AGE_URGENCY = (1.0, 1.2, 1.3)
+_AMOUNT_URGENCY_BUCKETS = (50000, 100000)
+_AMOUNT_URGENCY = (1.0, 1.2, 1.4)
+
+# One compiled alternation per category, so matching a case type is a
+# single C-level scan per category instead of a substring test per pattern
+_CASE_TYPE_MATCHERS = [
+    (category, patterns, re.compile('|'.join(map(re.escape, patterns))))
+    for category, patterns in CASE_TYPE_PATTERNS.items()
+]
+
+_COMPLEXITY_TERMS_RE = re.compile('complex|investigation|legal|appeal|dispute')
+
+# Complexity indicators
+_COMPLEX_CASE_TYPE_RE = re.compile('liability|workers compensation|legal review')
+_LEGAL_STATUS_RE = re.compile('legal|dispute|appeal')
+_REGULATED_STATES = frozenset({'california', 'new york', 'florida', 'texas'})
+
+_COMMON_REGULATORY_KEYWORDS = (
+    'insurance code', 'regulatory compliance', 'state requirements',
+    'filing requirements', 'coverage mandates'
+)
+
+_TEMPORAL_KEYWORDS = {
+    'new': ('new claim', 'initial review', 'first notice'),
+    'recent': ('investigation', 'documentation', 'evidence'),
+    'mature': ('settlement', 'negotiation', 'resolution'),
+    'aged': ('closure', 'appeal', 'final review', 'compliance')
+}
+
+_FINANCIAL_KEYWORDS = {
+    category: ('claim amount', 'coverage', 'deductible') + extra
+    for category, extra in {
+        'small': ('small claim', 'quick settlement'),
+        'medium': ('standard processing', 'documentation'),
+        'large': ('large loss', 'investigation', 'approval required'),
+        'major': ('major loss', 'special handling', 'executive approval')
+    }.items()
+}
+
+# Case types and states repeat constantly across requests, so the pure
+# per-string extractors below are memoized. They return tuples so callers
+# cannot mutate a cached result.
+
+@lru_cache(maxsize=1024)
+def _compound_keywords(text: str) -> Tuple[str, ...]:
+    """Extract compound keywords from text"""
+    # Split on common delimiters
+    parts = _SPLIT_RE.split(text.lower())
+    
+    # Create compound terms
+    return tuple(
+        f"{parts[i]} {parts[i + 1]}"
+        for i in range(len(parts) - 1)
+        if len(parts[i]) > 2 and len(parts[i + 1]) > 2
+    )
+
+@lru_cache(maxsize=1024)
+def _case_type_features(case_type: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Keywords and categories for a case type, each deduplicated in order"""
+    case_type_lower = case_type.lower()
+    keywords = {case_type_lower: None}
+    categories = {'general': None}
+    
+    # Match against known patterns
+    for category, patterns, matcher in _CASE_TYPE_MATCHERS:
+        if matcher.search(case_type_lower):
+            keywords.update(dict.fromkeys(patterns))
+            categories[category] = None
+            
+    # Extract compound terms
+    keywords.update(dict.fromkeys(_compound_keywords(case_type)))
+    
+    return tuple(keywords), tuple(categories)
+
+@lru_cache(maxsize=256)
+def _geographic_features(state: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """State-specific regulations and keywords"""
+    state_lower = state.lower().replace(' ', '_')
+    
+    regulations = (f"{state} law", f"{state} regulation", f"{state} statute")
+    keywords = (state.lower(),) + tuple(STATE_SPECIFIC_TERMS.get(state_lower, ())) + _COMMON_REGULATORY_KEYWORDS
+    
+    return regulations, keywords
+
+class _LoweredContext(NamedTuple):
+    """Lowercased case context fields, computed once per extraction"""
+    case_type: str
+    state: str
+    status: str
+    customer_type: str
+    priority: str
+
+def _lowered_context(context: CaseContext) -> _LoweredContext:
+    return _LoweredContext(
+        case_type=context.case_type.lower(),
+        state=(context.state or '').lower(),
+        status=(context.status or '').lower(),
+        customer_type=(context.customer_type or '').lower(),
+        priority=(context.priority or '').lower()
+    )
+
+def _categorize_age(days: int) -> str:
+    """Categorize case age"""
+    return _AGE_LABELS[bisect_left(_AGE_BUCKETS, days)]
+
+def _categorize_amount(amount: float) -> str:
+    """Categorize claim amount"""
+    return _AMOUNT_LABELS[bisect_right(_AMOUNT_BUCKETS, amount)]
+
 class ContextEngine:
     """Engine for extracting context features and generating intelligent suggestions"""
     
-    def __init__(self):
-        self.case_type_patterns = {
-            'flood': ['flood', 'water damage', 'hurricane', 'storm damage', 'flooding'],
-            'auto': ['auto', 'car', 'vehicle', 'collision', 'accident', 'automotive'],
-            'property': ['property', 'home', 'house', 'dwelling', 'homeowner'],
-            'liability': ['liability', 'personal injury', 'bodily injury', 'property damage'],
-            'workers_comp': ['workers compensation', 'work injury', 'workplace', 'employee'],
-            'health': ['health', 'medical', 'healthcare', 'treatment', 'hospital'],
-            'life': ['life insurance', 'death benefit', 'beneficiary', 'mortality'],
-            'disability': ['disability', 'impairment', 'unable to work', 'incapacitated']
-        }
-        
-        self.state_specific_terms = {
-            'florida': ['florida statute', 'fl law', 'hurricane coverage', 'windstorm'],
-            'california': ['california code', 'ca regulation', 'earthquake', 'wildfire'],
-            'texas': ['texas law', 'tx statute', 'hail damage', 'tornado'],
-            'new_york': ['new york law', 'ny regulation', 'no-fault', 'pip coverage'],
-            'illinois': ['illinois law', 'il statute', 'comparative fault']
-        }
+    case_type_patterns = CASE_TYPE_PATTERNS
+    state_specific_terms = STATE_SPECIFIC_TERMS
+    priority_weights = PRIORITY_WEIGHTS
+    
+    async def extract_features(
+        self,
+        context: CaseContext,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Extract meaningful features from case context
         
-        self.priority_weights = {
-            'high': 1.5,
-            'urgent': 2.0,
-            'critical': 2.5,
-            'medium': 1.0,
-            'low': 0.8
-        }
+        ``now`` is the reference time for case age (defaults to the current time).
+        """
+        return self._extract_features(context, now)
         
-    async def extract_features(self, context: CaseContext) -> Dict[str, Any]:
-        """Extract meaningful features from case context"""
+    def _extract_features(self, context: CaseContext, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Synchronous body of extract_features"""
         try:
+            # Keyword containers are dicts used as insertion-ordered sets
             features = {
                 'case_id': context.case_id,
-                'primary_keywords': [],
-                'secondary_keywords': [],
-                'regulatory_context': [],
+                'primary_keywords': {},
+                'secondary_keywords': {},
+                'regulatory_context': {},
                 'urgency_score': 1.0,
                 'complexity_indicators': [],
-                'document_categories': [],
+                'document_categories': {},
                 'search_focus': []
             }
             
+            lowered = _lowered_context(context)
+            
             # Extract case type features
-            case_type_features = await self._extract_case_type_features(context.case_type)
-            features['primary_keywords'].extend(case_type_features['keywords'])
-            features['document_categories'].extend(case_type_features['categories'])
+            keywords, categories = _case_type_features(context.case_type)
+            features['primary_keywords'].update(dict.fromkeys(keywords))
+            features['document_categories'].update(dict.fromkeys(categories))
             
             # Extract geographic/regulatory context
             if context.state:
-                geo_features = await self._extract_geographic_features(context.state)
-                features['regulatory_context'].extend(geo_features['regulations'])
-                features['secondary_keywords'].extend(geo_features['keywords'])
+                regulations, keywords = _geographic_features(context.state)
+                features['regulatory_context'].update(dict.fromkeys(regulations))
+                features['secondary_keywords'].update(dict.fromkeys(keywords))
+                
+            # Case age is shared by the temporal features and the urgency score
+            days_old = None
+            if context.date_created:
+                days_old = ((now or datetime.now()) - context.date_created).days
                 
             # Calculate urgency and complexity
-            features['urgency_score'] = await self._calculate_urgency_score(context)
-            features['complexity_indicators'] = await self._identify_complexity_indicators(context)
+            features['urgency_score'] = self._calculate_urgency_score(context, lowered, days_old)
+            features['complexity_indicators'] = self._identify_complexity_indicators(context, lowered)
             
-            # Extract temporal context
-            temporal_features = await self._extract_temporal_features(context)
-            features.update(temporal_features)
-            
-            # Extract financial context
-            if context.claim_amount:
-                financial_features = await self._extract_financial_features(context.claim_amount)
-                features.update(financial_features)
+            # Extract temporal and financial context
+            features.update(self._extract_temporal_and_financial(days_old, context.claim_amount))
                 
             # Process custom fields
             if context.custom_fields:
-                custom_features = await self._extract_custom_features(context.custom_fields)
-                features['secondary_keywords'].extend(custom_features.get('keywords', []))
+                custom_features = self._extract_custom_features(context.custom_fields)
+                features['secondary_keywords'].update(custom_features.get('keywords', {}))
                 
             # Determine search focus areas
-            features['search_focus'] = await self._determine_search_focus(context, features)
+            features['search_focus'] = self._determine_search_focus(context, lowered, features)
             
-            logger.info(f"Extracted features for case {context.case_id}: {len(features['primary_keywords'])} primary keywords")
+            logger.info(
+                "Extracted features for case %s: %d primary keywords",
+                context.case_id, len(features['primary_keywords'])
+            )
             return features
             
         except Exception as e:
             logger.error(f"Feature extraction failed for case {context.case_id}: {e}")
             raise
             
-    async def _extract_case_type_features(self, case_type: str) -> Dict[str, List[str]]:
-        """Extract keywords and categories from case type"""
-        case_type_lower = case_type.lower()
-        keywords = [case_type.lower()]
-        categories = ['general']
-        
-        # Match against known patterns
-        for category, patterns in self.case_type_patterns.items():
-            for pattern in patterns:
-                if pattern in case_type_lower:
-                    keywords.extend(patterns)
-                    categories.append(category)
-                    break
-                    
-        # Extract compound terms
-        compound_keywords = await self._extract_compound_keywords(case_type)
-        keywords.extend(compound_keywords)
-        
-        return {
-            'keywords': list(set(keywords)),
-            'categories': list(set(categories))
-        }
-        
-    async def _extract_geographic_features(self, state: str) -> Dict[str, List[str]]:
-        """Extract state-specific regulatory and keyword context"""
-        state_lower = state.lower().replace(' ', '_')
-        
-        regulations = [f"{state} law", f"{state} regulation", f"{state} statute"]
-        keywords = [state.lower()]
-        
-        # Add state-specific terms
-        if state_lower in self.state_specific_terms:
-            keywords.extend(self.state_specific_terms[state_lower])
-            
-        # Add common regulatory terms
-        keywords.extend([
-            'insurance code', 'regulatory compliance', 'state requirements',
-            'filing requirements', 'coverage mandates'
-        ])
-        
-        return {
-            'regulations': regulations,
-            'keywords': keywords
-        }
-        
-    async def _calculate_urgency_score(self, context: CaseContext) -> float:
+    def _calculate_urgency_score(
+        self,
+        context: CaseContext,
+        lowered: _LoweredContext,
+        days_old: Optional[int]
+    ) -> float:
         """Calculate urgency score based on context factors"""
         base_score = 1.0
         
         # Priority-based scoring
-        if context.priority:
-            priority_weight = self.priority_weights.get(context.priority.lower(), 1.0)
+        if lowered.priority:
+            priority_weight = PRIORITY_WEIGHTS.get(lowered.priority, 1.0)
             base_score *= priority_weight
             
         # Time-based scoring
-        if context.date_created:
-            days_old = (datetime.now() - context.date_created).days
-            if days_old > 30:
-                base_score *= 1.3  # Older cases get higher priority
-            elif days_old > 14:
-                base_score *= 1.2
+        if days_old is not None:
+            base_score *= _AGE_URGENCY[bisect_left(_AGE_URGENCY_BUCKETS, days_old)]
                 
         # Amount-based scoring
         if context.claim_amount:
-            if context.claim_amount > 100000:
-                base_score *= 1.4
-            elif context.claim_amount > 50000:
-                base_score *= 1.2
+            base_score *= _AMOUNT_URGENCY[bisect_left(_AMOUNT_URGENCY_BUCKETS, context.claim_amount)]
                 
         # Status-based scoring
-        status_urgency = {
-            'pending review': 1.3,
-            'investigation': 1.5,
-            'dispute': 1.8,
-            'legal review': 2.0,
-            'appeal': 1.9
-        }
-        
-        if context.status:
-            status_weight = status_urgency.get(context.status.lower(), 1.0)
+        if lowered.status:
+            status_weight = _STATUS_URGENCY.get(lowered.status, 1.0)
             base_score *= status_weight
             
         return min(base_score, 3.0)  # Cap at 3.0
         
-    async def _identify_complexity_indicators(self, context: CaseContext) -> List[str]:
+    def _identify_complexity_indicators(self, context: CaseContext, lowered: _LoweredContext) -> List[str]:
         """Identify factors that indicate case complexity"""
         indicators = []
         
         # Check case type complexity
-        complex_case_types = ['liability', 'workers compensation', 'legal review']
-        if any(term in context.case_type.lower() for term in complex_case_types):
+        if _COMPLEX_CASE_TYPE_RE.search(lowered.case_type):
             indicators.append('complex_case_type')
             
         # Check for multiple parties or policies
-        if context.customer_type and 'multiple' in context.customer_type.lower():
+        if 'multiple' in lowered.customer_type:
             indicators.append('multiple_parties')
             
         # High-value claims
@@ -199,106 +293,56 @@ class ContextEngine:
             indicators.append('high_value')
             
         # Legal involvement
-        if context.status and any(term in context.status.lower() for term in ['legal', 'dispute', 'appeal']):
+        if _LEGAL_STATUS_RE.search(lowered.status):
             indicators.append('legal_involvement')
             
         # Regulatory complexity
-        regulated_states = ['california', 'new york', 'florida', 'texas']
-        if context.state and context.state.lower() in regulated_states:
+        if lowered.state in _REGULATED_STATES:
             indicators.append('regulatory_complexity')
             
         return indicators
         
-    async def _extract_temporal_features(self, context: CaseContext) -> Dict[str, Any]:
-        """Extract time-based features"""
+    def _extract_temporal_and_financial(
+        self,
+        days_old: Optional[int],
+        amount: Optional[float]
+    ) -> Dict[str, Any]:
+        """Extract features based on case age and claim amount"""
         features = {}
         
-        if context.date_created:
-            now = datetime.now()
-            days_old = (now - context.date_created).days
-            
+        if days_old is not None:
+            age_category = _categorize_age(days_old)
             features['case_age_days'] = days_old
-            features['case_age_category'] = self._categorize_age(days_old)
-            features['temporal_keywords'] = self._get_temporal_keywords(days_old)
+            features['case_age_category'] = age_category
+            features['temporal_keywords'] = list(_TEMPORAL_KEYWORDS[age_category])
+            
+        if amount:
+            amount_category = _categorize_amount(amount)
+            features['claim_amount'] = amount
+            features['amount_category'] = amount_category
+            features['financial_keywords'] = list(_FINANCIAL_KEYWORDS[amount_category])
             
         return features
         
-    def _categorize_age(self, days: int) -> str:
-        """Categorize case age"""
-        if days <= 7:
-            return 'new'
-        elif days <= 30:
-            return 'recent'
-        elif days <= 90:
-            return 'mature'
-        else:
-            return 'aged'
-            
-    def _get_temporal_keywords(self, days: int) -> List[str]:
-        """Get keywords based on case age"""
-        if days <= 7:
-            return ['new claim', 'initial review', 'first notice']
-        elif days <= 30:
-            return ['investigation', 'documentation', 'evidence']
-        elif days <= 90:
-            return ['settlement', 'negotiation', 'resolution']
-        else:
-            return ['closure', 'appeal', 'final review', 'compliance']
-            
-    async def _extract_financial_features(self, amount: float) -> Dict[str, Any]:
-        """Extract features based on claim amount"""
-        features = {
-            'claim_amount': amount,
-            'amount_category': self._categorize_amount(amount),
-            'financial_keywords': self._get_financial_keywords(amount)
-        }
-        
-        return features
-        
-    def _categorize_amount(self, amount: float) -> str:
-        """Categorize claim amount"""
-        if amount < 5000:
-            return 'small'
-        elif amount < 25000:
-            return 'medium'
-        elif amount < 100000:
-            return 'large'
-        else:
-            return 'major'
-            
-    def _get_financial_keywords(self, amount: float) -> List[str]:
-        """Get keywords based on claim amount"""
-        keywords = ['claim amount', 'coverage', 'deductible']
-        
-        if amount < 5000:
-            keywords.extend(['small claim', 'quick settlement'])
-        elif amount < 25000:
-            keywords.extend(['standard processing', 'documentation'])
-        elif amount < 100000:
-            keywords.extend(['large loss', 'investigation', 'approval required'])
-        else:
-            keywords.extend(['major loss', 'special handling', 'executive approval'])
-            
-        return keywords
-        
-    async def _extract_custom_features(self, custom_fields: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract features from custom fields"""
-        features = {'keywords': []}
+    def _extract_custom_features(self, custom_fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract features from custom fields (keywords as an ordered set)"""
+        features = {'keywords': {}}
         
         for key, value in custom_fields.items():
             if isinstance(value, str):
                 # Extract meaningful terms from string values
-                words = re.findall(r'\b\w+\b', value.lower())
-                features['keywords'].extend([word for word in words if len(word) > 3])
+                words = _WORD_RE.findall(value.lower())
+                features['keywords'].update(dict.fromkeys(word for word in words if len(word) > 3))
             elif key in ['priority', 'category', 'type']:
                 # Add important categorical values
-                features['keywords'].append(str(value).lower())
+                features['keywords'][str(value).lower()] = None
                 
         return features
         
-    async def _determine_search_focus(
+    def _determine_search_focus(
         self, 
         context: CaseContext, 
+        lowered: _LoweredContext,
         features: Dict[str, Any]
     ) -> List[str]:
         """Determine primary areas to focus search on"""
@@ -313,7 +357,7 @@ class ContextEngine:
             focus_areas.append('complex_cases')
             
         # Based on case type
-        case_type_lower = context.case_type.lower()
+        case_type_lower = lowered.case_type
         if 'flood' in case_type_lower:
             focus_areas.extend(['weather_related', 'property_damage'])
         elif 'auto' in case_type_lower:
@@ -327,68 +371,53 @@ class ContextEngine:
             
         return focus_areas
         
-    async def _extract_compound_keywords(self, text: str) -> List[str]:
-        """Extract compound keywords from text"""
-        # Split on common delimiters
-        parts = re.split(r'[,;\-_\s]+', text.lower())
-        
-        # Create compound terms
-        compounds = []
-        for i in range(len(parts) - 1):
-            if len(parts[i]) > 2 and len(parts[i + 1]) > 2:
-                compounds.append(f"{parts[i]} {parts[i + 1]}")
-                
-        return compounds
-        
     async def generate_queries(self, features: Dict[str, Any]) -> List[str]:
         """Generate search queries based on extracted features"""
+        # Every template is built around the primary keywords
+        if not features['primary_keywords']:
+            return ['insurance policy procedures']
+            
         queries = []
         
         try:
+            # Keyword prefixes shared by every query template
+            primary_keywords = list(islice(features['primary_keywords'], 3))
+            top2 = ' '.join(primary_keywords[:2])
+            top3 = ' '.join(primary_keywords)
+            
             # Primary query from main keywords
-            if features['primary_keywords']:
-                primary_query = ' '.join(features['primary_keywords'][:3])
-                queries.append(primary_query)
+            queries.append(top3)
                 
             # Regulatory-focused queries
-            if features['regulatory_context']:
-                for regulation in features['regulatory_context'][:2]:
-                    reg_query = f"{regulation} {' '.join(features['primary_keywords'][:2])}"
-                    queries.append(reg_query)
-                    
+            for regulation in islice(features['regulatory_context'], 2):
+                queries.append(f"{regulation} {top2}")
+                
             # Focus-area specific queries
             for focus_area in features.get('search_focus', [])[:3]:
-                focus_keywords = features['primary_keywords'][:2]
-                focus_query = f"{focus_area} {' '.join(focus_keywords)}"
-                queries.append(focus_query)
+                queries.append(f"{focus_area} {top2}")
                 
             # Complexity-based queries
             if features.get('complexity_indicators'):
-                complex_query = f"complex cases {' '.join(features['primary_keywords'][:2])}"
-                queries.append(complex_query)
+                queries.append(f"complex cases {top2}")
                 
             # Temporal queries for aged cases
             if features.get('case_age_category') == 'aged':
-                temporal_query = f"case closure procedures {' '.join(features['primary_keywords'][:2])}"
-                queries.append(temporal_query)
+                queries.append(f"case closure procedures {top2}")
                 
             # Financial threshold queries
             if features.get('amount_category') in ['large', 'major']:
-                financial_query = f"high value claims {' '.join(features['primary_keywords'][:2])}"
-                queries.append(financial_query)
+                queries.append(f"high value claims {top2}")
                 
-            # Remove duplicates and empty queries
-            queries = list(set([q.strip() for q in queries if q.strip()]))
+            # Remove duplicates and empty queries, keeping generation order
+            queries = list(dict.fromkeys(query for query in map(str.strip, queries) if query))
             
-            logger.info(f"Generated {len(queries)} queries from features")
+            logger.info("Generated %d queries from features", len(queries))
             return queries[:8]  # Limit to 8 queries
             
         except Exception as e:
             logger.error(f"Query generation failed: {e}")
             # Fallback to basic query
-            if features['primary_keywords']:
-                return [' '.join(features['primary_keywords'][:3])]
-            return ['insurance policy procedures']
+            return [' '.join(islice(features['primary_keywords'], 3))]
             
     async def rank_suggestions(
         self,
@@ -397,117 +426,150 @@ class ContextEngine:
     ) -> List[SuggestionResponse]:
         """Rank suggestions based on context relevance"""
         try:
-            scored_suggestions = []
+            # Keyword matchers and the clock are shared by every suggestion
+            primary_keywords, regulatory_matcher = self._score_matchers(features)
+            now = datetime.now()
+            
+            # Lowercase each suggestion once for scoring and dedupe
+            contents_lower = [suggestion.content.lower() for suggestion in suggestions]
             
-            for suggestion in suggestions:
-                score = await self._calculate_suggestion_score(suggestion, features)
+            scores = [
+                self._calculate_suggestion_score(
+                    suggestion, content_lower, features, primary_keywords, regulatory_matcher, now
+                )
+                for suggestion, content_lower in zip(suggestions, contents_lower)
+            ]
+            for suggestion, score in zip(suggestions, scores):
                 suggestion.relevance_score = score
-                scored_suggestions.append(suggestion)
                 
-            # Sort by score (descending)
-            scored_suggestions.sort(key=lambda x: x.relevance_score, reverse=True)
+            # Sort by score (descending), keeping the lowered content aligned.
+            # scores.__getitem__ is a C-level key, unlike a lambda.
+            order = sorted(range(len(suggestions)), key=scores.__getitem__, reverse=True)
+            scored_suggestions = [suggestions[i] for i in order]
             
             # Remove duplicates based on content similarity
-            deduplicated = await self._deduplicate_suggestions(scored_suggestions)
+            deduplicated = self._deduplicate_suggestions(
+                scored_suggestions,
+                [contents_lower[i] for i in order]
+            )
             
-            logger.info(f"Ranked {len(suggestions)} suggestions, returning {len(deduplicated)}")
+            logger.info("Ranked %d suggestions, returning %d", len(suggestions), len(deduplicated))
             return deduplicated
             
         except Exception as e:
             logger.error(f"Suggestion ranking failed: {e}")
             return suggestions
             
-    async def _calculate_suggestion_score(
+    @staticmethod
+    def _score_matchers(features: Dict[str, Any]) -> Tuple[List[str], Optional[re.Pattern]]:
+        """Lowercased primary keywords and one regex over every regulatory term"""
+        primary_keywords = [keyword.lower() for keyword in features['primary_keywords']]
+        
+        regulatory_terms = {
+            term for reg in features['regulatory_context'] for term in reg.lower().split()
+        }
+        regulatory_matcher = None
+        if regulatory_terms:
+            regulatory_matcher = re.compile('|'.join(map(re.escape, regulatory_terms)))
+            
+        return primary_keywords, regulatory_matcher
+        
+    def _calculate_suggestion_score(
         self,
         suggestion: SuggestionResponse,
-        features: Dict[str, Any]
+        content_lower: str,
+        features: Dict[str, Any],
+        primary_keywords: List[str],
+        regulatory_matcher: Optional[re.Pattern],
+        now: datetime
     ) -> float:
-        """Calculate relevance score for a suggestion"""
+        """Calculate relevance score for a suggestion (matchers from _score_matchers)"""
         base_score = suggestion.relevance_score
         
         # Keyword matching bonus
-        content_lower = suggestion.content.lower()
-        keyword_matches = sum(
-            1 for keyword in features['primary_keywords']
-            if keyword.lower() in content_lower
-        )
+        keyword_matches = sum(keyword in content_lower for keyword in primary_keywords)
         
-        if features['primary_keywords']:
-            keyword_score = keyword_matches / len(features['primary_keywords'])
+        if primary_keywords:
+            keyword_score = keyword_matches / len(primary_keywords)
             base_score += keyword_score * 0.3
             
         # Urgency bonus
         urgency_multiplier = min(features.get('urgency_score', 1.0) / 2.0, 0.3)
         base_score += urgency_multiplier
         
-        # Regulatory context bonus
-        if features['regulatory_context']:
-            reg_matches = sum(
-                1 for reg in features['regulatory_context']
-                if any(term in content_lower for term in reg.lower().split())
-            )
-            if reg_matches > 0:
-                base_score += 0.2
+        # Regulatory context bonus (any term of any regulation appears)
+        if regulatory_matcher is not None and regulatory_matcher.search(content_lower):
+            base_score += 0.2
                 
         # Complexity indicator bonus
         if features.get('complexity_indicators'):
-            complexity_terms = ['complex', 'investigation', 'legal', 'appeal', 'dispute']
-            if any(term in content_lower for term in complexity_terms):
+            if _COMPLEXITY_TERMS_RE.search(content_lower):
                 base_score += 0.15
                 
         # Recency bonus for newer documents
         if hasattr(suggestion, 'timestamp'):
             # Prefer more recent suggestions
-            days_old = (datetime.now() - suggestion.timestamp).days
+            days_old = (now - suggestion.timestamp).days
             if days_old < 30:
                 base_score += 0.1
                 
         return min(base_score, 1.0)  # Cap at 1.0
         
-    async def _deduplicate_suggestions(
+    def _deduplicate_suggestions(
         self,
-        suggestions: List[SuggestionResponse]
+        suggestions: List[SuggestionResponse],
+        contents_lower: Optional[List[str]] = None
     ) -> List[SuggestionResponse]:
-        """Remove duplicate or very similar suggestions"""
-        if not suggestions:
-            return suggestions
-            
-        deduplicated = [suggestions[0]]  # Always keep the highest scored
-        
-        for suggestion in suggestions[1:]:
-            is_duplicate = False
-            
-            for existing in deduplicated:
-                # Check for content similarity
-                if await self._are_similar_suggestions(suggestion, existing):
-                    is_duplicate = True
-                    break
-                    
-            if not is_duplicate:
-                deduplicated.append(suggestion)
+        """Remove duplicate or very similar suggestions
+        
+        Suggestions are indexed as they are kept: a set of (document, page)
+        locations, and content word sets bucketed by size so only buckets
+        whose sizes can reach the overlap threshold are compared.
+        """
+        if contents_lower is None:
+            contents_lower = [suggestion.content.lower() for suggestion in suggestions]
+            
+        deduplicated = []
+        seen_locations = set()
+        kept_by_size: Dict[int, List[frozenset]] = defaultdict(list)
+        
+        for suggestion, content_lower in zip(suggestions, contents_lower):
+            # Same document and page as a kept suggestion
+            location = (suggestion.source_document, suggestion.page_number)
+            if location in seen_locations:
+                continue
+                
+            # Similar content (simple word overlap check)
+            words = frozenset(content_lower.split())
+            if words and self._has_similar_content(words, kept_by_size):
+                continue
+                
+            deduplicated.append(suggestion)
+            seen_locations.add(location)
+            if words:
+                kept_by_size[len(words)].append(words)
                 
         return deduplicated
         
-    async def _are_similar_suggestions(
+    def _has_similar_content(
         self,
-        suggestion1: SuggestionResponse,
-        suggestion2: SuggestionResponse
+        words: frozenset,
+        kept_by_size: Dict[int, List[frozenset]]
     ) -> bool:
-        """Check if two suggestions are too similar"""
-        # Same document and page
-        if (suggestion1.source_document == suggestion2.source_document and
-            suggestion1.page_number == suggestion2.page_number):
-            return True
-            
-        # Similar content (simple word overlap check)
-        words1 = set(suggestion1.content.lower().split())
-        words2 = set(suggestion2.content.lower().split())
+        """Check a word set against kept ones for 80% word overlap"""
+        size = len(words)
         
-        if len(words1) > 0 and len(words2) > 0:
-            overlap = len(words1.intersection(words2))
-            similarity = overlap / max(len(words1), len(words2))
+        for other_size, word_sets in kept_by_size.items():
+            longer = max(size, other_size)
             
-            if similarity > 0.8:  # 80% word overlap threshold
-                return True
+            # Overlap can't exceed the smaller set, so the threshold is unreachable
+            if min(size, other_size) / longer <= 0.8:
+                continue
                 
+            # 80% word overlap threshold, as a count for the whole bucket
+            min_overlap = 0.8 * longer
+            for other in word_sets:
+                if len(words & other) > min_overlap:
+                    return True
+                    
         return False
\ No newline at end of file
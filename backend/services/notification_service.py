@@ -2,21 +2,89 @@
 Notification service for email, push, and system alerts
 """
 import asyncio
+import heapq
+from itertools import chain
 import logging
-from typing import Dict, Any, List, Optional
+import os
+from typing import Dict, Any, List, Optional, Tuple, Literal
 from datetime import datetime
 from pathlib import Path
-import json
+import aiofiles
+import orjson
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# The log is append-only JSONL: one line per notification plus small op
+# records ({"op": "ack"|"read"|"delete", "id": ...}) that are folded in on read.
+# Once the file passes this size it is rewritten with the ops applied.
+COMPACT_THRESHOLD_BYTES = 1_000_000
+MAX_NOTIFICATIONS = 1000
+
+# Trimming to MAX_NOTIFICATIONS is lazy: writes only schedule a background
+# compaction once this many are held, so it runs once per ~100 writes
+COMPACT_AT_NOTIFICATIONS = 1100
+
+# Outcome of a notification update; expected misses are not exceptions
+UpdateStatus = Literal["ok", "not_found", "error"]
+
 class NotificationService:
     """Manages all types of notifications"""
     
     def __init__(self):
-        self.notification_log = Path("data/notifications.json")
+        self.notification_log = Path("data/notifications.jsonl")
         self.notification_log.parent.mkdir(parents=True, exist_ok=True)
+        self._migrate_legacy_store(Path("data/notifications.json"))
+        self._lock = asyncio.Lock()
+        
+        # Replayed log, reused until the file's (mtime, size) changes
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache_key: Optional[Tuple[int, int]] = None
+        
+        # (type, user_id) -> notifications, rebuilt lazily after any change
+        self._index: Optional[Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]]] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+    
+    def _migrate_legacy_store(self, legacy_path: Path):
+        """One-time move of the old JSON array store into the log
+        
+        Legacy entries go in front of anything already logged, and entries
+        written before ids existed get one. The old file is then renamed to
+        ``*.migrated`` so this only ever runs once.
+        """
+        if not legacy_path.exists():
+            return
+        
+        try:
+            with open(legacy_path, 'rb') as f:
+                legacy = orjson.loads(f.read() or b'[]')
+            
+            for notification in legacy:
+                notification.setdefault('id', str(uuid.uuid4()))
+            
+            existing = self.notification_log.read_bytes() if self.notification_log.exists() else b''
+            tmp_path = self.notification_log.with_suffix('.jsonl.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.writelines(orjson.dumps(n) + b'\n' for n in legacy)
+                f.write(existing)
+            os.replace(tmp_path, self.notification_log)
+            
+            legacy_path.rename(legacy_path.with_suffix('.json.migrated'))
+            logger.info(f"Migrated {len(legacy)} notifications from {legacy_path} to {self.notification_log}")
+        except Exception as e:
+            logger.error(f"Failed to migrate legacy notifications from {legacy_path}: {e}")
+    
+    @property
+    def version_tag(self) -> str:
+        """Opaque token that changes whenever the notification log is written
+        
+        Taken from the file's (mtime, size) like the replay cache, so appends
+        made by other processes change it too.
+        """
+        key = self._stat_key()
+        if key is None:
+            return "empty"
+        return f"{key[0]:x}-{key[1]:x}"
         
     async def send_email_notification(
         self, 
@@ -146,26 +214,130 @@ class NotificationService:
             logger.error(f"Failed to create system alert: {e}")
             return False
     
+    @staticmethod
+    def sort_key(notification: Dict[str, Any]) -> Tuple[str, str]:
+        """(timestamp, id) ordering key, also used for pagination cursors"""
+        return (
+            notification.get('sent_at', notification.get('created_at', '')),
+            notification.get('id', '')
+        )
+    
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        """(mtime, size) of the log, or None if it doesn't exist yet"""
+        try:
+            st = self.notification_log.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    @staticmethod
+    def _apply_record(notifications: Dict[str, Dict[str, Any]], record: Dict[str, Any]):
+        """Fold one log record into the notifications keyed by id"""
+        op = record.get('op')
+        if op is None:
+            notifications[record['id']] = record
+            return
+        
+        target = notifications.get(record.get('id'))
+        if target is None:
+            return
+        if op == 'ack':
+            target['acknowledged'] = True
+            target['acknowledged_at'] = record['at']
+        elif op == 'read':
+            target['read'] = True
+            target['read_at'] = record['at']
+        elif op == 'delete':
+            del notifications[record['id']]
+    
+    @classmethod
+    def _replay_sync(cls, path: Path) -> Dict[str, Dict[str, Any]]:
+        """Read and replay the whole log; blocking, run in a worker thread"""
+        notifications: Dict[str, Dict[str, Any]] = {}
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    cls._apply_record(notifications, orjson.loads(line))
+        return notifications
+    
+    @staticmethod
+    def _write_sync(path: Path, notifications: List[Dict[str, Any]]):
+        """Atomically replace the log with the given notifications; blocking"""
+        tmp_path = path.with_suffix('.jsonl.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.writelines(orjson.dumps(n) + b'\n' for n in notifications)
+        os.replace(tmp_path, path)
+    
+    async def _current(self) -> Dict[str, Dict[str, Any]]:
+        """Cached notifications, replayed only if the file changed; caller holds the lock"""
+        key = self._stat_key()
+        if key is None:
+            return {}
+        if key != self._cache_key:
+            # One thread job for open+read+parse beats many small aiofiles reads
+            self._cache = await asyncio.to_thread(self._replay_sync, self.notification_log)
+            self._cache_key = key
+            self._index = None
+        return self._cache
+    
+    async def _load_notifications(self) -> Dict[str, Dict[str, Any]]:
+        """Current notifications keyed by id"""
+        async with self._lock:
+            return await self._current()
+    
+    async def _load_index(self) -> Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]]:
+        """Current notifications partitioned by (type, user_id)"""
+        async with self._lock:
+            notifications = await self._current()
+            if self._index is None:
+                index: Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+                for n in notifications.values():
+                    index.setdefault((n.get('type'), n.get('user_id')), []).append(n)
+                self._index = index
+            return self._index
+    
+    async def _append_record(self, record: Dict[str, Any]):
+        """Append a single record to the log, compacting it in the background once it grows too large"""
+        line = orjson.dumps(record) + b'\n'
+        async with self._lock:
+            notifications = await self._current()
+            async with aiofiles.open(self.notification_log, 'ab') as f:
+                await f.write(line)
+            
+            # Keep the cache in step with our own write instead of replaying
+            self._apply_record(notifications, record)
+            self._cache = notifications
+            self._cache_key = self._stat_key()
+            self._index = None
+        
+        if (len(self._cache) >= COMPACT_AT_NOTIFICATIONS
+                or self._cache_key[1] > COMPACT_THRESHOLD_BYTES):
+            self._schedule_compaction()
+    
+    def _schedule_compaction(self):
+        """Start a background compaction unless one is already running"""
+        if self._compaction_task is None or self._compaction_task.done():
+            self._compaction_task = asyncio.create_task(self.compact())
+    
+    async def compact(self):
+        """Rewrite the log with all ops applied, keeping the newest notifications"""
+        try:
+            async with self._lock:
+                notifications = list((await self._current()).values())
+                notifications = notifications[-MAX_NOTIFICATIONS:]
+                
+                await asyncio.to_thread(self._write_sync, self.notification_log, notifications)
+                
+                self._cache = {n['id']: n for n in notifications}
+                self._cache_key = self._stat_key()
+                self._index = None
+        except Exception as e:
+            logger.error(f"Failed to compact notification log: {e}")
+    
     async def _log_notification(self, notification: Dict[str, Any]):
         """Log notification to file"""
         try:
-            # Load existing notifications
-            notifications = []
-            if self.notification_log.exists():
-                with open(self.notification_log, 'r') as f:
-                    notifications = json.load(f)
-            
-            # Add new notification
-            notifications.append(notification)
-            
-            # Keep only last 1000 notifications
-            if len(notifications) > 1000:
-                notifications = notifications[-1000:]
-            
-            # Save to file
-            with open(self.notification_log, 'w') as f:
-                json.dump(notifications, f, indent=2)
-                
+            await self._append_record(notification)
         except Exception as e:
             logger.error(f"Failed to log notification: {e}")
     
@@ -173,37 +345,48 @@ class NotificationService:
         self,
         user_id: Optional[str] = None,
         notification_type: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        after: Optional[Tuple[str, str]] = None,
+        severity: Optional[str] = None,
+        acknowledged: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
-        """Get notifications with optional filtering"""
+        """Get notifications with optional filtering
+        
+        All filters are applied in a single pass before the newest ``limit``
+        entries are selected, so filtered queries still return full pages.
+        ``after`` is the (timestamp, id) key of the last notification of the
+        previous page; only older notifications are returned.
+        """
         try:
-            if not self.notification_log.exists():
-                return []
-            
-            with open(self.notification_log, 'r') as f:
-                notifications = json.load(f)
-            
-            # Filter by user_id if provided
-            if user_id:
-                notifications = [
-                    n for n in notifications 
-                    if n.get('user_id') == user_id or n.get('type') == 'system_alert'
-                ]
-            
-            # Filter by type if provided
-            if notification_type:
-                notifications = [
-                    n for n in notifications 
-                    if n.get('type') == notification_type
-                ]
-            
-            # Sort by timestamp (newest first)
-            notifications.sort(
-                key=lambda x: x.get('sent_at', x.get('created_at', '')), 
-                reverse=True
+            index = await self._load_index()
+            
+            # Only scan the partitions that can match the type/user filters
+            notifications = chain.from_iterable(
+                bucket for (n_type, n_user), bucket in index.items()
+                if (not notification_type or n_type == notification_type)
+                and (not user_id or n_user == user_id or n_type == 'system_alert')
             )
             
-            return notifications[:limit]
+            if after:
+                after = tuple(after)
+            
+            def matches(n: Dict[str, Any]) -> bool:
+                if user_id and n.get('user_id') != user_id and n.get('type') != 'system_alert':
+                    return False
+                if notification_type and n.get('type') != notification_type:
+                    return False
+                if severity and n.get('severity') != severity:
+                    return False
+                if acknowledged is not None and n.get('acknowledged') != acknowledged:
+                    return False
+                return not after or self.sort_key(n) < after
+            
+            # Newest first, keeping only the requested page
+            return heapq.nlargest(
+                limit,
+                (n for n in notifications if matches(n)),
+                key=self.sort_key
+            )
             
         except Exception as e:
             logger.error(f"Failed to get notifications: {e}")
@@ -212,119 +395,85 @@ class NotificationService:
     async def get_system_alerts(
         self,
         severity: Optional[str] = None,
-        acknowledged: Optional[bool] = None
+        acknowledged: Optional[bool] = None,
+        limit: int = 50,
+        after: Optional[Tuple[str, str]] = None
     ) -> List[Dict[str, Any]]:
         """Get system alerts with filtering"""
-        try:
-            alerts = await self.get_notifications(notification_type="system_alert")
-            
-            # Filter by severity
-            if severity:
-                alerts = [a for a in alerts if a.get('severity') == severity]
-            
-            # Filter by acknowledged status
-            if acknowledged is not None:
-                alerts = [a for a in alerts if a.get('acknowledged') == acknowledged]
-            
-            return alerts
-            
-        except Exception as e:
-            logger.error(f"Failed to get system alerts: {e}")
-            return []
+        return await self.get_notifications(
+            notification_type="system_alert",
+            limit=limit,
+            after=after,
+            severity=severity,
+            acknowledged=acknowledged
+        )
     
-    async def acknowledge_alert(self, alert_id: str) -> bool:
+    async def acknowledge_alert(self, alert_id: str) -> UpdateStatus:
         """Mark an alert as acknowledged"""
         try:
-            if not self.notification_log.exists():
-                return False
-            
-            with open(self.notification_log, 'r') as f:
-                notifications = json.load(f)
-            
-            # Find and update the alert
-            found = False
-            for notification in notifications:
-                if notification.get('id') == alert_id:
-                    notification['acknowledged'] = True
-                    notification['acknowledged_at'] = datetime.now().isoformat()
-                    found = True
-                    break
+            notifications = await self._load_notifications()
+            if alert_id not in notifications:
+                return "not_found"
             
-            if not found:
-                return False
+            await self._append_record({
+                "op": "ack",
+                "id": alert_id,
+                "at": datetime.now().isoformat()
+            })
             
-            # Save updated notifications
-            with open(self.notification_log, 'w') as f:
-                json.dump(notifications, f, indent=2)
-            
-            return True
+            return "ok"
             
         except Exception as e:
             logger.error(f"Failed to acknowledge alert: {e}")
-            return False
+            return "error"
     
-    async def mark_notification_read(self, notification_id: str, user_id: str) -> bool:
+    async def mark_notification_read(self, notification_id: str, user_id: str) -> UpdateStatus:
         """Mark a notification as read"""
         try:
-            if not self.notification_log.exists():
-                return False
-            
-            with open(self.notification_log, 'r') as f:
-                notifications = json.load(f)
-            
-            # Find and update the notification
-            found = False
-            for notification in notifications:
-                if notification.get('id') == notification_id:
-                    # Verify user has access to this notification
-                    if notification.get('user_id') == user_id or notification.get('type') == 'system_alert':
-                        notification['read'] = True
-                        notification['read_at'] = datetime.now().isoformat()
-                        found = True
-                        break
-            
-            if not found:
-                return False
-            
-            # Save updated notifications
-            with open(self.notification_log, 'w') as f:
-                json.dump(notifications, f, indent=2)
+            notifications = await self._load_notifications()
+            notification = notifications.get(notification_id)
             
-            return True
+            # Verify user has access to this notification
+            if notification is None or not (
+                notification.get('user_id') == user_id or notification.get('type') == 'system_alert'
+            ):
+                return "not_found"
+            
+            await self._append_record({
+                "op": "read",
+                "id": notification_id,
+                "at": datetime.now().isoformat()
+            })
+            
+            return "ok"
             
         except Exception as e:
             logger.error(f"Failed to mark notification as read: {e}")
-            return False
+            return "error"
     
-    async def delete_notification(self, notification_id: str, user_id: str) -> bool:
+    async def delete_notification(self, notification_id: str, user_id: str) -> UpdateStatus:
         """Delete a notification"""
         try:
-            if not self.notification_log.exists():
-                return False
-            
-            with open(self.notification_log, 'r') as f:
-                notifications = json.load(f)
+            notifications = await self._load_notifications()
+            notification = notifications.get(notification_id)
             
-            # Find and remove the notification
-            initial_count = len(notifications)
-            notifications = [
-                n for n in notifications 
-                if not (n.get('id') == notification_id and 
-                       (n.get('user_id') == user_id or n.get('type') == 'system_alert'))
-            ]
+            if notification is None or not (
+                notification.get('user_id') == user_id or notification.get('type') == 'system_alert'
+            ):
+                return "not_found"
             
-            if len(notifications) == initial_count:
-                return False
+            # Recorded as a tombstone; compaction drops the notification for good
+            await self._append_record({
+                "op": "delete",
+                "id": notification_id,
+                "at": datetime.now().isoformat()
+            })
             
-            # Save updated notifications
-            with open(self.notification_log, 'w') as f:
-                json.dump(notifications, f, indent=2)
-            
-            return True
+            return "ok"
             
         except Exception as e:
             logger.error(f"Failed to delete notification: {e}")
-            return False
+            return "error"
 
 # Global notification service instance
 notification_service = NotificationService()
@@ -2,13 +2,23 @@
 Vector-based semantic search engine using Chroma DB
 """
 import asyncio
+import heapq
 import logging
-from typing import List, Dict, Any, Optional
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import numpy as np
 
+try:
+    import simsimd  # Optional: SIMD (AVX-512/NEON) distance kernels
+except ImportError:
+    simsimd = None
+
 # import chromadb  # Temporarily disabled due to build dependencies
 # from chromadb.config import Settings as ChromaSettings
+import torch
 from sentence_transformers import SentenceTransformer
 
 from models.schemas import DocumentChunk, SearchResult
@@ -16,6 +26,37 @@ from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Metadata fields that search filters can target
+FILTER_FIELDS = ('document_category', 'tags', 'document_id', 'page_number')
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+# Query embeddings kept for repeated searches (recent searches, similar-docs)
+QUERY_CACHE_SIZE = 1024
+
+# Embedding batches encoded at once. torch already spreads each batch over the
+# cores, so a couple of workers overlap batches without oversubscribing them.
+EMBED_WORKERS = 2
+
+# Embedding matrix rows allocated up front
+INITIAL_CAPACITY = 1024
+
+# Chunks embedded and stored per step of index_document
+INDEX_BATCH_SIZE = 512
+
+def _quantize(vectors: np.ndarray) -> np.ndarray:
+    """Map unit vectors to int8 with a fixed scale of 127"""
+    return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8)
+
+def _cosine_similarities(matrix: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """Cosine similarity of a unit query vector against every (unit) row
+    
+    An int8 matrix only exists when simsimd is available to score it.
+    """
+    if simsimd is not None and len(matrix):
+        distances = simsimd.cdist(query_vec[np.newaxis, :], matrix, metric='cosine')
+        return 1.0 - np.asarray(distances)[0]
+    return matrix @ query_vec
+
 class SearchEngine:
     """Semantic search engine with vector embeddings"""
     
@@ -25,6 +66,8 @@ class SearchEngine:
         self.collection = None
         self.embedding_model = None
         self.model_name = settings.embedding_model
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embed_pool: Optional[ThreadPoolExecutor] = None
         
     async def initialize(self):
         """Initialize vector database and embedding model"""
@@ -38,8 +81,30 @@ class SearchEngine:
             self._mock_documents = {}
             logger.warning("Using mock vector database - ChromaDB not available")
             
-            # Load embedding model
-            self.embedding_model = SentenceTransformer(self.model_name)
+            # Load embedding model; on a GPU run it in half precision
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.embedding_model = SentenceTransformer(self.model_name, device=device)
+            if device == 'cuda':
+                self.embedding_model.half()
+            if self._embed_pool is None:
+                self._embed_pool = ThreadPoolExecutor(
+                    max_workers=EMBED_WORKERS, thread_name_prefix='embed'
+                )
+            
+            # Embeddings live in one contiguous matrix; row i belongs to chunk _ids[i].
+            # Capacity grows by doubling, so only the first len(_ids) rows are live.
+            dim = self.embedding_model.get_sentence_embedding_dimension()
+            self._quantized = settings.quantize_embeddings and simsimd is not None
+            if settings.quantize_embeddings and not self._quantized:
+                logger.warning("quantize_embeddings needs simsimd; keeping float32 embeddings")
+            self._emb_matrix = np.empty((INITIAL_CAPACITY, dim), dtype=np.int8 if self._quantized else np.float32)
+            self._ids: List[str] = []
+            self._rows: Dict[str, int] = {}
+            
+            # metadata field -> value -> matrix rows, rebuilt lazily after changes
+            self._filter_index: Optional[Dict[str, Dict[Any, np.ndarray]]] = None
+            # Distinct words (joined text, offsets, words, rows per word), likewise lazy
+            self._token_index: Optional[Tuple[str, np.ndarray, List[str], List[np.ndarray]]] = None
             
             logger.info(f"Search engine initialized with mock database")
             
@@ -47,6 +112,12 @@ class SearchEngine:
             logger.error(f"Search engine initialization failed: {e}")
             raise
             
+    def close(self):
+        """Shut down the embedding threads, if started"""
+        if self._embed_pool is not None:
+            self._embed_pool.shutdown(wait=False, cancel_futures=True)
+            self._embed_pool = None
+            
     async def health_check(self) -> bool:
         """Check if search engine is healthy"""
         try:
@@ -77,64 +148,25 @@ class SearchEngine:
                 logger.warning(f"No chunks to index for document {doc_id}")
                 return
                 
-            # Prepare data for indexing
-            texts = []
-            chunk_metadata = []
-            chunk_ids = []
-            
-            for i, chunk in enumerate(chunks):
-                # Handle both dict and object chunks
-                if isinstance(chunk, dict):
-                    content = chunk.get('content', '')
-                    chunk_id = chunk.get('id', f"{doc_id}_chunk_{i}")
-                    page_number = chunk.get('page_number', 0)
-                    paragraph_number = chunk.get('paragraph_number', 0)
-                    chunk_index = chunk.get('chunk_index', i)
-                    section_title = chunk.get('section_title', '')
-                    chunk_meta_extra = chunk.get('metadata', {})
-                else:
-                    content = chunk.content
-                    chunk_id = chunk.id
-                    page_number = chunk.page_number
-                    paragraph_number = chunk.paragraph_number or 0
-                    chunk_index = chunk.chunk_index
-                    section_title = chunk.section_title or ''
-                    chunk_meta_extra = chunk.metadata
-                
-                texts.append(content)
-                chunk_ids.append(chunk_id)
+            # Embed and store a slice at a time, so the texts, metadata and
+            # embeddings held for a large document stay bounded by the slice
+            for start in range(0, len(chunks), INDEX_BATCH_SIZE):
+                chunk_ids, texts, chunk_metadata = self._prepare_chunks(
+                    chunks[start:start + INDEX_BATCH_SIZE], start, doc_id, filename, metadata
+                )
                 
-                # Create metadata for each chunk with multiple filename fields for compatibility
-                chunk_meta = {
-                    'document_id': doc_id,
-                    'page_number': page_number,
-                    'paragraph_number': paragraph_number,
-                    'chunk_index': chunk_index,
-                    'word_count': len(content.split()),
-                    'document_category': metadata.get('category', 'unknown'),
-                    'document_filename': filename,  # Primary field
-                    'filename': filename,  # Alternate field
-                    'document_title': filename,  # For citations
-                    'section_title': section_title,
-                    'tags': ','.join(metadata.get('tags', [])),
-                }
+                # Generate embeddings
+                embeddings = await self._generate_embeddings(texts)
                 
-                # Add custom metadata
-                if chunk_meta_extra:
-                    chunk_meta.update(chunk_meta_extra)
-                chunk_metadata.append(chunk_meta)
+                # Mock add to collection
+                for i, text in enumerate(texts):
+                    self._mock_documents[chunk_ids[i]] = {
+                        'text': text,
+                        'metadata': chunk_metadata[i],
+                        'tokens': frozenset(text.lower().split())
+                    }
+                self._store_embeddings(chunk_ids, embeddings)
                 
-            # Generate embeddings
-            embeddings = await self._generate_embeddings(texts)
-            
-            # Mock add to collection
-            for i, text in enumerate(texts):
-                self._mock_documents[chunk_ids[i]] = {
-                    'text': text,
-                    'metadata': chunk_metadata[i],
-                    'embedding': embeddings[i].tolist() if hasattr(embeddings, 'tolist') else embeddings[i]
-                }
-            
             logger.info(f"Indexed {len(chunks)} chunks for document {doc_id}")
             
         except Exception as e:
@@ -142,6 +174,162 @@ class SearchEngine:
             logger.error(f"Document indexing failed for {doc_id}: {e}")
             raise
             
+    @staticmethod
+    def _prepare_chunks(
+        chunks: List[Any],
+        offset: int,
+        doc_id: str,
+        filename: str,
+        metadata: Dict[str, Any]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """Ids, texts and index metadata for a run of chunks starting at `offset`"""
+        texts = []
+        chunk_metadata = []
+        chunk_ids = []
+        
+        for i, chunk in enumerate(chunks, start=offset):
+            # Handle both dict and object chunks
+            if isinstance(chunk, dict):
+                content = chunk.get('content', '')
+                chunk_id = chunk.get('id', f"{doc_id}_chunk_{i}")
+                page_number = chunk.get('page_number', 0)
+                paragraph_number = chunk.get('paragraph_number', 0)
+                chunk_index = chunk.get('chunk_index', i)
+                section_title = chunk.get('section_title', '')
+                chunk_meta_extra = chunk.get('metadata', {})
+            else:
+                content = chunk.content
+                chunk_id = chunk.id
+                page_number = chunk.page_number
+                paragraph_number = chunk.paragraph_number or 0
+                chunk_index = chunk.chunk_index
+                section_title = chunk.section_title or ''
+                chunk_meta_extra = chunk.metadata
+            
+            texts.append(content)
+            chunk_ids.append(chunk_id)
+            
+            # Create metadata for each chunk with multiple filename fields for compatibility
+            chunk_meta = {
+                'document_id': doc_id,
+                'page_number': page_number,
+                'paragraph_number': paragraph_number,
+                'chunk_index': chunk_index,
+                'word_count': len(content.split()),
+                'document_category': metadata.get('category', 'unknown'),
+                'document_filename': filename,  # Primary field
+                'filename': filename,  # Alternate field
+                'document_title': filename,  # For citations
+                'section_title': section_title,
+                'tags': ','.join(metadata.get('tags', [])),
+            }
+            
+            # Add custom metadata
+            if chunk_meta_extra:
+                chunk_meta.update(chunk_meta_extra)
+            chunk_metadata.append(chunk_meta)
+            
+        return chunk_ids, texts, chunk_metadata
+        
+    def _store_embeddings(self, chunk_ids: List[str], embeddings: np.ndarray):
+        """Write chunk embeddings into the matrix, overwriting rows of re-indexed chunks"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self._quantized:
+            embeddings = _quantize(embeddings)
+        
+        self._filter_index = None
+        self._token_index = None
+        
+        # Last occurrence wins if a chunk id repeats within the batch
+        latest = dict(zip(chunk_ids, range(len(chunk_ids))))
+        new_ids = [cid for cid in latest if cid not in self._rows]
+        
+        existing = [cid for cid in latest if cid in self._rows]
+        if existing:
+            self._emb_matrix[[self._rows[cid] for cid in existing]] = embeddings[[latest[cid] for cid in existing]]
+            
+        if new_ids:
+            start = len(self._ids)
+            end = start + len(new_ids)
+            if end > self._emb_matrix.shape[0]:
+                grown = np.empty((max(end, 2 * self._emb_matrix.shape[0]), self._emb_matrix.shape[1]),
+                                 dtype=self._emb_matrix.dtype)
+                grown[:start] = self._emb_matrix[:start]
+                self._emb_matrix = grown
+            self._emb_matrix[start:end] = embeddings[[latest[cid] for cid in new_ids]]
+            for offset, cid in enumerate(new_ids):
+                self._rows[cid] = start + offset
+            self._ids.extend(new_ids)
+            
+    def _remove_rows(self, chunk_ids: List[str]):
+        """Drop the matrix rows of the given chunks, keeping the rest contiguous"""
+        drop = [self._rows[cid] for cid in chunk_ids if cid in self._rows]
+        if not drop:
+            return
+        self._filter_index = None
+        self._token_index = None
+        keep = np.ones(len(self._ids), dtype=bool)
+        keep[drop] = False
+        kept = self._emb_matrix[:len(self._ids)][keep]
+        self._emb_matrix[:len(kept)] = kept
+        self._ids = [cid for cid, kept in zip(self._ids, keep) if kept]
+        self._rows = {cid: row for row, cid in enumerate(self._ids)}
+        
+    def _get_filter_index(self) -> Dict[str, Dict[Any, np.ndarray]]:
+        """Row ids per value of each filterable metadata field"""
+        if self._filter_index is None:
+            postings: Dict[str, Dict[Any, List[int]]] = {field: {} for field in FILTER_FIELDS}
+            for row, chunk_id in enumerate(self._ids):
+                metadata = self._mock_documents[chunk_id]['metadata']
+                for field, values in postings.items():
+                    if field in metadata:
+                        values.setdefault(metadata[field], []).append(row)
+            self._filter_index = {
+                field: {value: np.array(rows, dtype=np.intp) for value, rows in values.items()}
+                for field, values in postings.items()
+            }
+        return self._filter_index
+        
+    def _get_token_index(self) -> Tuple[str, np.ndarray, List[str], List[np.ndarray]]:
+        """Vocabulary of indexed words and the row ids of the chunks containing each
+        
+        The words are also joined into one newline-separated text, with each
+        word's start offset, so a pattern can scan the whole vocabulary at once.
+        """
+        if self._token_index is None:
+            postings: Dict[str, List[int]] = {}
+            for row, chunk_id in enumerate(self._ids):
+                for token in self._mock_documents[chunk_id]['tokens']:
+                    postings.setdefault(token, []).append(row)
+            words = list(postings)
+            offsets = np.cumsum([0] + [len(word) + 1 for word in words[:-1]])
+            self._token_index = (
+                '\n'.join(words),
+                offsets,
+                words,
+                [np.array(postings[word], dtype=np.intp) for word in words]
+            )
+        return self._token_index
+        
+    def _filter_rows(self, where_clause: Dict[str, Any]) -> np.ndarray:
+        """Sorted matrix rows whose metadata satisfies every clause"""
+        index = self._get_filter_index()
+        rows = None
+        for key, value in where_clause.items():
+            postings = index[key]
+            if isinstance(value, dict) and '$contains' in value:
+                # Substring match against each distinct value, e.g. the tags string
+                matched = [r for v, r in postings.items() if value['$contains'] in v]
+                key_rows = np.sort(np.concatenate(matched)) if matched else _NO_ROWS
+            elif isinstance(value, dict):
+                key_rows = _NO_ROWS
+            else:
+                key_rows = postings.get(value, _NO_ROWS)
+            rows = key_rows if rows is None else np.intersect1d(rows, key_rows, assume_unique=True)
+            if rows.size == 0:
+                break
+        return rows
+        
     async def search(
         self, 
         query: str,
@@ -151,7 +339,7 @@ class SearchEngine:
         """Search for relevant documents"""
         try:
             # Generate query embedding
-            query_embedding = await self._generate_embeddings([query])
+            query_vec = await self._embed_query(query)
             
             # Prepare where clause for filtering
             where_clause = {}
@@ -171,60 +359,35 @@ class SearchEngine:
             search_results = []
             
             # Search through mock documents if available
-            if hasattr(self, '_mock_documents') and self._mock_documents:
-                # Calculate similarity scores for all documents
-                scored_docs = []
-                query_embedding_flat = query_embedding[0] if len(query_embedding.shape) > 1 else query_embedding
+            if getattr(self, '_ids', None):
+                if self._quantized:
+                    query_vec = _quantize(query_vec)
                 
-                for chunk_id, chunk_data in self._mock_documents.items():
-                    metadata = chunk_data['metadata']
-                    
-                    # Apply filters if provided
-                    if where_clause:
-                        skip = False
-                        for key, value in where_clause.items():
-                            if key in metadata:
-                                if isinstance(value, dict) and '$contains' in value:
-                                    if value['$contains'] not in metadata[key]:
-                                        skip = True
-                                        break
-                                elif metadata[key] != value:
-                                    skip = True
-                                    break
-                        if skip:
-                            continue
-                    
-                    # Calculate cosine similarity
-                    doc_embedding = np.array(chunk_data['embedding'])
-                    similarity = np.dot(query_embedding_flat, doc_embedding) / (
-                        np.linalg.norm(query_embedding_flat) * np.linalg.norm(doc_embedding)
-                    )
-                    
-                    # Convert to positive score (0 to 1)
-                    similarity_score = (similarity + 1) / 2
-                    
-                    # Skip results below threshold
-                    if similarity_score < settings.similarity_threshold:
-                        continue
-                    
-                    scored_docs.append({
-                        'text': chunk_data['text'],
-                        'metadata': metadata,
-                        'score': similarity_score
-                    })
+                # Filters select rows up front, so only matching chunks are scored
+                rows = self._filter_rows(where_clause) if where_clause else None
+                matrix = self._emb_matrix[:len(self._ids)] if rows is None else self._emb_matrix[rows]
                 
-                # Sort by score and take top results
-                scored_docs.sort(key=lambda x: x['score'], reverse=True)
-                scored_docs = scored_docs[:limit]
+                # Rows and query are unit vectors, so one pass over the matrix
+                # gives every cosine similarity; mapped to 0..1 as before
+                scores = (_cosine_similarities(matrix, query_vec) + 1) / 2
                 
-                # Convert to SearchResult objects
-                for doc_data in scored_docs:
-                    metadata = doc_data['metadata']
+                # Drop rows under the threshold, partition out the best `limit`
+                # of the rest, then order just those
+                keep = np.flatnonzero(scores >= settings.similarity_threshold)
+                k = min(limit, keep.size)
+                top = keep[np.argpartition(-scores[keep], k - 1)[:k]] if k > 0 else _NO_ROWS
+                top = top[np.lexsort((top, -scores[top]))]
+                
+                # Results are only built for the rows that made the cut
+                for i in top:
+                    row = i if rows is None else rows[i]
+                    chunk_data = self._mock_documents[self._ids[row]]
+                    metadata = chunk_data['metadata']
                     result = SearchResult(
                         document_id=metadata['document_id'],
                         title=metadata.get('document_filename', 'Unknown Document'),
-                        content=doc_data['text'],
-                        score=doc_data['score'],
+                        content=chunk_data['text'],
+                        score=float(scores[i]),
                         document_path=f"/documents/{metadata['document_id']}",
                         page_number=metadata['page_number'],
                         paragraph_number=metadata.get('paragraph_number'),
@@ -284,46 +447,54 @@ class SearchEngine:
     ) -> List[SearchResult]:
         """Perform keyword-based search for exact matches"""
         try:
-            # Extract keywords from query
-            keywords = query.lower().split()
-            
-            # Search for documents containing keywords
+            # A keyword matches a chunk when it occurs inside any of its words,
+            # e.g. "claim" in "claim," or "auto" in "automobile"
+            keywords = set(query.lower().split())
             results = []
             
-            # Get all documents and filter by keyword matching
-            all_results = self.collection.get(
-                include=['documents', 'metadatas']
-            )
-            
-            if all_results['documents']:
+            if keywords and getattr(self, '_ids', None):
                 scored_results = []
                 
-                for i, (doc, metadata) in enumerate(zip(
-                    all_results['documents'],
-                    all_results['metadatas']
-                )):
-                    doc_lower = doc.lower()
+                # One pass of a keyword alternation over the vocabulary finds the
+                # words containing any keyword; only those words are checked per
+                # keyword. Keywords hold no whitespace, so no match spans two words.
+                text, offsets, words, word_rows = self._get_token_index()
+                pattern = re.compile('|'.join(map(re.escape, sorted(keywords))))
+                starts = [m.start() for m in pattern.finditer(text)]
+                hits = np.unique(np.searchsorted(offsets, starts, side='right') - 1)
+                
+                keyword_rows: Dict[str, List[np.ndarray]] = {}
+                for w in hits.tolist():
+                    for k in keywords:
+                        if k in words[w]:
+                            keyword_rows.setdefault(k, []).append(word_rows[w])
+                            
+                # Only chunks with a matching word are visited. Each posting list
+                # holds a row once, so a row's count across the lists is its
+                # number of matched keywords.
+                postings = [np.unique(np.concatenate(r)) for r in keyword_rows.values()]
+                if postings:
+                    rows, counts = np.unique(np.concatenate(postings), return_counts=True)
+                else:
+                    rows = counts = _NO_ROWS
+                    
+                for row, keyword_matches in zip(rows.tolist(), counts.tolist()):
+                    chunk_data = self._mock_documents[self._ids[row]]
+                    metadata = chunk_data['metadata']
                     
-                    # Calculate keyword match score
-                    keyword_matches = sum(1 for keyword in keywords if keyword in doc_lower)
-                    if keyword_matches > 0:
-                        score = keyword_matches / len(keywords)
+                    # Apply context filtering if available
+                    if context and not self._matches_context(metadata, context):
+                        continue
                         
-                        # Apply context filtering if available
-                        if context and not self._matches_context(metadata, context):
-                            continue
-                            
-                        scored_results.append((doc, metadata, score))
+                    scored_results.append((chunk_data['text'], metadata, keyword_matches))
                         
-                # Sort by score and convert to SearchResult
-                scored_results.sort(key=lambda x: x[2], reverse=True)
-                
-                for doc, metadata, score in scored_results[:limit]:
+                # Keep the best `limit` and convert to SearchResult
+                for doc, metadata, keyword_matches in heapq.nlargest(limit, scored_results, key=lambda x: x[2]):
                     result = SearchResult(
                         document_id=metadata['document_id'],
                         title=metadata.get('document_filename', 'Unknown Document'),
                         content=doc,
-                        score=score,
+                        score=keyword_matches / len(keywords),
                         document_path=f"/documents/{metadata['document_id']}",
                         page_number=metadata['page_number'],
                         paragraph_number=metadata.get('paragraph_number'),
@@ -395,14 +566,14 @@ class SearchEngine:
         
         # Add direct results with higher weight
         for result in direct_results:
-            key = f"{result.document_id}_{result.page_number}_{result.paragraph_number}"
+            key = (result.document_id, result.page_number, result.paragraph_number)
             if key not in result_dict:
                 result.score *= 1.2  # Boost semantic results
                 result_dict[key] = result
                 
         # Add keyword results
         for result in keyword_results:
-            key = f"{result.document_id}_{result.page_number}_{result.paragraph_number}"
+            key = (result.document_id, result.page_number, result.paragraph_number)
             if key not in result_dict:
                 result_dict[key] = result
             else:
@@ -415,9 +586,35 @@ class SearchEngine:
         
         return combined_results
         
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """Unit float32 embedding of a search query, cached for repeated queries"""
+        key = ' '.join(query.split())
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._query_cache.move_to_end(key)
+            return cached
+            
+        embedding = np.asarray((await self._generate_embeddings([key]))[0], dtype=np.float32)
+        embedding = embedding / np.linalg.norm(embedding)
+        
+        self._query_cache[key] = embedding
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return embedding
+        
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode one batch on the embedding pool, without autograd bookkeeping"""
+        with torch.inference_mode():
+            return self.embedding_model.encode(
+                texts, 
+                show_progress_bar=False,
+                batch_size=min(len(texts), 32),  # Internal batch size for the model
+                normalize_embeddings=True  # Normalize for faster similarity computation
+            )
+            
     async def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for texts with optimized batch processing"""
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         
         # Optimize batch size based on text count
         if len(texts) <= 10:
@@ -427,35 +624,28 @@ class SearchEngine:
         else:
             batch_size = 32  # Large batches
         
-        all_embeddings = []
-        
         # Only log for large batches to reduce overhead
-        should_log = len(texts) > 20
+        if len(texts) > 20:
+            logger.info(f"Generating embeddings for {len(texts)} texts in batches of {batch_size}")
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            if should_log:
-                logger.info(f"Generating embeddings: {i+len(batch)}/{len(texts)} texts")
-            
-            # Run embedding generation in thread pool to avoid blocking
-            # Use normalized batch encoding for better performance
-            batch_embeddings = await loop.run_in_executor(
-                None,
-                lambda b=batch: self.embedding_model.encode(
-                    b, 
-                    show_progress_bar=False,
-                    batch_size=min(len(b), 32),  # Internal batch size for the model
-                    normalize_embeddings=True  # Normalize for faster similarity computation
-                )
+        # Length-sorted batches pad less; results are scattered back below
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        ordered = [texts[i] for i in order]
+        
+        # Batches run concurrently on the embedding pool; gather keeps their order
+        all_embeddings = await asyncio.gather(*(
+            loop.run_in_executor(
+                self._embed_pool,
+                self._encode_batch,
+                ordered[i:i+batch_size]
             )
-            
-            all_embeddings.append(batch_embeddings)
+            for i in range(0, len(texts), batch_size)
+        ))
         
-        # Concatenate all batches
-        if len(all_embeddings) == 1:
-            return all_embeddings[0]
-        else:
-            return np.vstack(all_embeddings)
+        # Restore input order
+        out = np.empty((len(texts), all_embeddings[0].shape[1]), dtype=np.float32)
+        out[order] = all_embeddings[0] if len(all_embeddings) == 1 else np.vstack(all_embeddings)
+        return out
         
     async def remove_document(self, document_id: str):
         """Remove all chunks for a document from the vector store"""
@@ -472,6 +662,7 @@ class SearchEngine:
                 for chunk_id in chunk_ids_to_remove:
                     del self._mock_documents[chunk_id]
                     removed_count += 1
+                self._remove_rows(chunk_ids_to_remove)
                 
                 if removed_count > 0:
                     logger.info(f"Removed {removed_count} chunks for document {document_id}")
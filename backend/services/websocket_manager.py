@@ -2,29 +2,78 @@
 WebSocket connection manager for real-time suggestions
 """
 import asyncio
-import json
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+import numpy as np
+import orjson
 from fastapi import WebSocket
 
 logger = logging.getLogger(__name__)
 
+def _dumps(message: Dict[str, Any]) -> str:
+    """Serialize a message for a text frame; the frontend JSON.parses text frames
+    
+    Scores may still be numpy scalars, which orjson only takes with OPT_SERIALIZE_NUMPY.
+    """
+    return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
 class WebSocketManager:
     """Manager for WebSocket connections and real-time messaging"""
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.client_contexts: Dict[str, Dict[str, Any]] = {}
+        
+        # Client contexts as parallel arrays; row i belongs to _client_ids[i].
+        # Capacity grows geometrically and only the first len(_client_ids) rows are live.
+        self._client_ids: List[str] = []
+        self._client_rows: Dict[str, int] = {}
+        self._connected_at = np.zeros(16)
+        self._last_activity = np.zeros(16)
+        self._suggestion_count = np.zeros(16, dtype=np.int64)
+        
+        # Looked up on first use; every timestamp comes from this loop's clock
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+    def _time(self) -> float:
+        """Current event loop time"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop.time()
+        
+    def _add_client(self, client_id: str, now: float):
+        """Start (or restart) the context row of a client"""
+        row = self._client_rows.get(client_id)
+        if row is None:
+            row = len(self._client_ids)
+            if row == self._connected_at.size:
+                capacity = row * 2
+                self._connected_at = np.resize(self._connected_at, capacity)
+                self._last_activity = np.resize(self._last_activity, capacity)
+                self._suggestion_count = np.resize(self._suggestion_count, capacity)
+            self._client_ids.append(client_id)
+            self._client_rows[client_id] = row
+        self._connected_at[row] = now
+        self._last_activity[row] = now
+        self._suggestion_count[row] = 0
+        
+    def _remove_client(self, row: int):
+        """Drop a context row by moving the last row into its place"""
+        last = len(self._client_ids) - 1
+        del self._client_rows[self._client_ids[row]]
+        if row != last:
+            moved = self._client_ids[last]
+            self._client_ids[row] = moved
+            self._client_rows[moved] = row
+            self._connected_at[row] = self._connected_at[last]
+            self._last_activity[row] = self._last_activity[last]
+            self._suggestion_count[row] = self._suggestion_count[last]
+        self._client_ids.pop()
         
     async def connect(self, websocket: WebSocket, client_id: str):
         """Accept WebSocket connection and store client"""
         await websocket.accept()
         self.active_connections[client_id] = websocket
-        self.client_contexts[client_id] = {
-            'connected_at': asyncio.get_event_loop().time(),
-            'last_activity': asyncio.get_event_loop().time(),
-            'suggestion_count': 0
-        }
+        self._add_client(client_id, self._time())
         logger.info(f"Client {client_id} connected. Active connections: {len(self.active_connections)}")
         
     def disconnect(self, client_id: str):
@@ -32,12 +81,12 @@ class WebSocketManager:
         if client_id in self.active_connections:
             del self.active_connections[client_id]
             
-        if client_id in self.client_contexts:
-            context = self.client_contexts[client_id]
-            session_duration = asyncio.get_event_loop().time() - context['connected_at']
+        row = self._client_rows.get(client_id)
+        if row is not None:
+            session_duration = self._time() - self._connected_at[row]
             logger.info(f"Client {client_id} disconnected. Session duration: {session_duration:.2f}s, "
-                       f"Suggestions sent: {context['suggestion_count']}")
-            del self.client_contexts[client_id]
+                       f"Suggestions sent: {self._suggestion_count[row]}")
+            self._remove_client(row)
             
     async def send_personal_message(self, message: str, client_id: str):
         """Send message to specific client"""
@@ -47,9 +96,10 @@ class WebSocketManager:
                 await websocket.send_text(message)
                 
                 # Update client context
-                if client_id in self.client_contexts:
-                    self.client_contexts[client_id]['last_activity'] = asyncio.get_event_loop().time()
-                    self.client_contexts[client_id]['suggestion_count'] += 1
+                row = self._client_rows.get(client_id)
+                if row is not None:
+                    self._last_activity[row] = self._time()
+                    self._suggestion_count[row] += 1
                     
             except Exception as e:
                 logger.error(f"Failed to send message to client {client_id}: {e}")
@@ -60,34 +110,31 @@ class WebSocketManager:
         if not self.active_connections:
             return
             
-        disconnected_clients = []
-        
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(message)
+        # Send to everyone at once so one slow client doesn't hold up the rest
+        clients = list(self.active_connections.items())
+        results = await asyncio.gather(
+            *(websocket.send_text(message) for _, websocket in clients),
+            return_exceptions=True
+        )
+        
+        for (client_id, _), result in zip(clients, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to broadcast to client {client_id}: {result}")
+                self.disconnect(client_id)
                 
-                # Update client context
-                if client_id in self.client_contexts:
-                    self.client_contexts[client_id]['last_activity'] = asyncio.get_event_loop().time()
-                    
-            except Exception as e:
-                logger.error(f"Failed to broadcast to client {client_id}: {e}")
-                disconnected_clients.append(client_id)
+        # Everyone still connected was just reached
+        self._last_activity[:len(self._client_ids)] = self._time()
                 
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
-            
     async def send_suggestions(self, client_id: str, suggestions: List[Dict[str, Any]]):
         """Send suggestions to specific client"""
         message = {
             "type": "suggestions",
             "data": suggestions,
-            "timestamp": asyncio.get_event_loop().time(),
+            "timestamp": self._time(),
             "count": len(suggestions)
         }
         
-        await self.send_personal_message(json.dumps(message), client_id)
+        await self.send_personal_message(_dumps(message), client_id)
         
     async def send_error(self, client_id: str, error: str, details: Dict[str, Any] = None):
         """Send error message to client"""
@@ -95,10 +142,10 @@ class WebSocketManager:
             "type": "error",
             "error": error,
             "details": details or {},
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": self._time()
         }
         
-        await self.send_personal_message(json.dumps(message), client_id)
+        await self.send_personal_message(_dumps(message), client_id)
         
     async def send_status_update(self, client_id: str, status: str, data: Dict[str, Any] = None):
         """Send status update to client"""
@@ -106,10 +153,10 @@ class WebSocketManager:
             "type": "status",
             "status": status,
             "data": data or {},
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": self._time()
         }
         
-        await self.send_personal_message(json.dumps(message), client_id)
+        await self.send_personal_message(_dumps(message), client_id)
         
     def get_connected_clients(self) -> List[str]:
         """Get list of connected client IDs"""
@@ -117,27 +164,30 @@ class WebSocketManager:
         
     def get_client_info(self, client_id: str) -> Dict[str, Any]:
         """Get information about a specific client"""
-        if client_id not in self.client_contexts:
+        row = self._client_rows.get(client_id)
+        if row is None:
             return {}
             
-        context = self.client_contexts[client_id]
-        current_time = asyncio.get_event_loop().time()
+        connected_at = float(self._connected_at[row])
+        last_activity = float(self._last_activity[row])
+        current_time = self._time()
         
         return {
             'client_id': client_id,
             'connected': client_id in self.active_connections,
-            'connected_at': context['connected_at'],
-            'session_duration': current_time - context['connected_at'],
-            'last_activity': context['last_activity'],
-            'idle_time': current_time - context['last_activity'],
-            'suggestion_count': context['suggestion_count']
+            'connected_at': connected_at,
+            'session_duration': current_time - connected_at,
+            'last_activity': last_activity,
+            'idle_time': current_time - last_activity,
+            'suggestion_count': int(self._suggestion_count[row])
         }
         
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get overall connection statistics"""
-        current_time = asyncio.get_event_loop().time()
+        current_time = self._time()
         
-        if not self.client_contexts:
+        n = len(self._client_ids)
+        if not n:
             return {
                 'active_connections': 0,
                 'total_suggestions_sent': 0,
@@ -145,39 +195,33 @@ class WebSocketManager:
                 'clients': []
             }
             
-        total_suggestions = sum(ctx['suggestion_count'] for ctx in self.client_contexts.values())
-        session_durations = [
-            current_time - ctx['connected_at'] 
-            for ctx in self.client_contexts.values()
-        ]
-        avg_session_duration = sum(session_durations) / len(session_durations)
+        session_durations = current_time - self._connected_at[:n]
+        suggestion_counts = self._suggestion_count[:n]
         
         return {
             'active_connections': len(self.active_connections),
-            'total_clients': len(self.client_contexts),
-            'total_suggestions_sent': total_suggestions,
-            'average_session_duration': avg_session_duration,
+            'total_clients': n,
+            'total_suggestions_sent': int(suggestion_counts.sum()),
+            'average_session_duration': float(session_durations.mean()),
             'clients': [
                 {
                     'client_id': client_id,
                     'connected': client_id in self.active_connections,
-                    'suggestion_count': ctx['suggestion_count'],
-                    'session_duration': current_time - ctx['connected_at']
+                    'suggestion_count': count,
+                    'session_duration': duration
                 }
-                for client_id, ctx in self.client_contexts.items()
+                for client_id, count, duration in zip(
+                    self._client_ids, suggestion_counts.tolist(), session_durations.tolist()
+                )
             ]
         }
         
     async def cleanup_inactive_connections(self, timeout_seconds: int = 300):
         """Remove connections that have been inactive for too long"""
-        current_time = asyncio.get_event_loop().time()
-        inactive_clients = []
+        current_time = self._time()
+        idle_times = current_time - self._last_activity[:len(self._client_ids)]
+        inactive_clients = [self._client_ids[row] for row in np.flatnonzero(idle_times > timeout_seconds)]
         
-        for client_id, context in self.client_contexts.items():
-            idle_time = current_time - context['last_activity']
-            if idle_time > timeout_seconds:
-                inactive_clients.append(client_id)
-                
         for client_id in inactive_clients:
             logger.info(f"Removing inactive client {client_id}")
             if client_id in self.active_connections:
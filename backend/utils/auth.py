@@ -1,16 +1,30 @@
 """
 Authentication utilities - JWT token handling and password hashing
 """
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from jose import JWTError, jwt
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import statistics
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional, Dict, Any, Tuple
+import jwt
+from jwt import PyJWTError as JWTError
 import bcrypt
+import orjson
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import secrets
 
 from config.settings import settings
 
+logger = logging.getLogger(__name__)
+
 # Security scheme for JWT
 security = HTTPBearer()
 
@@ -18,109 +32,238 @@ security = HTTPBearer()
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+RESET_TOKEN_BYTES = 32
+
+# Token lifetimes in seconds, for epoch-based exp claims
+_ACCESS_TTL_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+_REFRESH_TTL_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+# Signing key and accepted algorithms, built once rather than on every call
+_SECRET_BYTES = settings.secret_key.encode('utf-8')
+_ALGORITHMS = (ALGORITHM,)
+
+# Verified token payloads, keyed by a digest of the token rather than the token
+# itself. Entries live for TOKEN_CACHE_TTL seconds at most and never past the
+# token's own exp, so a hit skips the signature check but not the expiry.
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_TTL = 60
+_token_cache: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+# Access tokens revoked before expiry (jti -> exp). Checked on every request,
+# so it is a plain in-memory map; expired entries are pruned on each revoke.
+_revoked_tokens: Dict[str, float] = {}
+
+# bcrypt cost bounds for calibration; OWASP's minimum is 10
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 12
+BCRYPT_MAX_PASSWORD_BYTES = 72  # bcrypt ignores anything past this
+_bcrypt_rounds: Optional[int] = None
+
+# Hashing runs in worker processes so logins don't stall the event loop;
+# the workers are started and warmed up at startup (see warm_bcrypt_pool)
+BCRYPT_WORKERS = os.cpu_count() or 1
+_bcrypt_pool: Optional[ProcessPoolExecutor] = None
+
+class _OrjsonJWT(jwt.PyJWT):
+    """PyJWT with the payload parsed by orjson; header parsing and signing are unchanged"""
+    
+    def _decode_payload(self, decoded: Dict[str, Any]) -> Any:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+# _decode_payload is a private hook (PyJWT 2.7+); without it use the stock decoder
+_jwt = _OrjsonJWT() if hasattr(jwt.PyJWT, '_decode_payload') else jwt.PyJWT()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+@dataclass(slots=True, frozen=True)
+class AuthUser:
+    """Authenticated user resolved from an access token"""
+    user_id: str
+    email: str
+    is_admin: bool = False
+
+def _warm_bcrypt_worker():
+    """Pool initializer: run one cheap hash so bcrypt is loaded before real work"""
+    bcrypt.hashpw(b"warmup", bcrypt.gensalt(rounds=4))
+
+def _get_bcrypt_pool() -> ProcessPoolExecutor:
+    """Process pool for bcrypt work"""
+    global _bcrypt_pool
+    if _bcrypt_pool is None:
+        _bcrypt_pool = ProcessPoolExecutor(max_workers=BCRYPT_WORKERS, initializer=_warm_bcrypt_worker)
+    return _bcrypt_pool
+
+def warm_bcrypt_pool():
+    """Start the bcrypt workers now so the first logins don't pay for process start-up"""
+    pool = _get_bcrypt_pool()
+    for future in [pool.submit(bcrypt.gensalt, 4) for _ in range(BCRYPT_WORKERS)]:
+        future.result()
+
+def close_bcrypt_pool():
+    """Shut down the bcrypt worker processes, if started"""
+    global _bcrypt_pool
+    if _bcrypt_pool is not None:
+        _bcrypt_pool.shutdown(wait=False, cancel_futures=True)
+        _bcrypt_pool = None
+
+def _password_bytes(password: str) -> bytes:
+    """UTF-8 password truncated to bcrypt's limit (slicing shorter bytes doesn't copy)"""
+    return password.encode('utf-8')[:BCRYPT_MAX_PASSWORD_BYTES]
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password"""
+    # Not a bcrypt hash at all; don't ship it to a worker just to fail there
+    if not hashed_password.startswith('$2'):
+        return False
+        
     try:
-        return bcrypt.checkpw(
-            plain_password.encode('utf-8'),
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_bcrypt_pool(),
+            bcrypt.checkpw,
+            _password_bytes(plain_password),
             hashed_password.encode('utf-8')
         )
-    except Exception:
+    except ValueError:
+        # Malformed hash (bad salt or cost)
+        return False
+    except Exception as e:
+        logger.error(f"Password verification failed: {e}")
         return False
 
-def get_password_hash(password: str) -> str:
+def calibrate_bcrypt_rounds() -> int:
+    """Highest bcrypt cost that hashes within settings.bcrypt_target_ms here
+    
+    Times the minimum cost and extrapolates, since each extra round doubles the
+    work. Measured once per process; later calls return the cached cost.
+    """
+    global _bcrypt_rounds
+    if _bcrypt_rounds is None:
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=BCRYPT_MIN_ROUNDS))
+            timings.append((time.perf_counter() - start) * 1000)
+        headroom = settings.bcrypt_target_ms / max(statistics.median(timings), 1e-3)
+        extra = int(math.log2(headroom)) if headroom >= 1 else 0
+        _bcrypt_rounds = min(BCRYPT_MIN_ROUNDS + extra, BCRYPT_MAX_ROUNDS)
+    return _bcrypt_rounds
+
+async def get_password_hash(password: str) -> str:
     """Hash a password"""
     # Truncate password to 72 bytes if needed (bcrypt limitation)
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    password_bytes = _password_bytes(password)
+    salt = bcrypt.gensalt(rounds=calibrate_bcrypt_rounds())
+    hashed = await asyncio.get_running_loop().run_in_executor(
+        _get_bcrypt_pool(), bcrypt.hashpw, password_bytes, salt
+    )
     return hashed.decode('utf-8')
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
-    to_encode = data.copy()
-    
+    # exp as epoch seconds, which is what PyJWT writes for a datetime anyway
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(time.time()) + _ACCESS_TTL_SECONDS
     
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    to_encode = {**data, "exp": expire, "type": "access", "jti": secrets.token_urlsafe(16)}
+    encoded_jwt = jwt.encode(to_encode, _SECRET_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
 def create_refresh_token(data: Dict[str, Any]) -> str:
     """Create a JWT refresh token"""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    expire = int(time.time()) + _REFRESH_TTL_SECONDS
+    to_encode = {**data, "exp": expire, "type": "refresh"}
+    encoded_jwt = jwt.encode(to_encode, _SECRET_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
 def decode_token(token: str) -> Dict[str, Any]:
     """Decode and validate a JWT token"""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.time()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        if cached[1] > now:
+            _token_cache.move_to_end(key)
+            return cached[0]
+        del _token_cache[key]
+        
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
-        return payload
+        payload = _jwt.decode(token, _SECRET_BYTES, algorithms=_ALGORITHMS)
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        
+    expires_at = now + TOKEN_CACHE_TTL
+    if isinstance(payload.get("exp"), (int, float)):
+        expires_at = min(expires_at, payload["exp"])
+    _token_cache[key] = (payload, expires_at)
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return payload
 
 def create_reset_token() -> str:
     """Create a secure random reset token"""
-    return secrets.token_urlsafe(32)
+    return secrets.token_urlsafe(RESET_TOKEN_BYTES)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+def revoke_token(token: str):
+    """Reject an access token from now on, until it expires"""
+    payload = decode_token(token)
+    jti = payload.get("jti")
+    if jti is None:
+        return
+        
+    now = time.time()
+    for expired in [k for k, exp in _revoked_tokens.items() if exp <= now]:
+        del _revoked_tokens[expired]
+    _revoked_tokens[jti] = payload.get("exp", now + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthUser:
     """Get current user from JWT token"""
-    token = credentials.credentials
+    # decode_token already turns any JWTError into a 401
+    payload = decode_token(credentials.credentials)
     
-    try:
-        payload = decode_token(token)
-        
-        # Verify it's an access token
-        if payload.get("type") != "access":
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token type",
-            )
-        
-        user_id: str = payload.get("user_id")
-        email: str = payload.get("email")
-        
-        if user_id is None or email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-            )
-        
-        return {
-            "user_id": user_id,
-            "email": email,
-            "is_admin": payload.get("is_admin", False)
-        }
+    # Verify it's an access token
+    if payload.get("type") != "access":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type",
+        )
         
-    except JWTError:
+    if payload.get("jti") in _revoked_tokens:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="Token has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    if not (user_id := payload.get("user_id")) or not (email := payload.get("email")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    
+    return AuthUser(
+        user_id=user_id,
+        email=email,
+        is_admin=payload.get("is_admin", False)
+    )
 
-async def get_current_active_user(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+async def get_current_active_user(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
     """Get current active user"""
     # You can add additional checks here (e.g., is_active status from DB)
     return current_user
 
-async def get_current_admin_user(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+async def get_current_admin_user(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
     """Get current admin user"""
-    if not current_user.get("is_admin", False):
+    if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions",
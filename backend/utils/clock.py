@@ -0,0 +1,20 @@
+"""
+Cheap wall-clock timestamps for hot request paths
+"""
+import time
+from datetime import datetime
+
+# (epoch second, formatted timestamp) for the most recent call
+_TS_CACHE = [0, ""]
+
+def iso_now() -> str:
+    """Return the current local time as an ISO-8601 string at second resolution.
+
+    The formatted value is cached for the rest of the current second, so
+    frequently polled endpoints only pay for one strftime per second.
+    """
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE[1] = datetime.fromtimestamp(now).isoformat()
+        _TS_CACHE[0] = now
+    return _TS_CACHE[1]
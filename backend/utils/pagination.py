@@ -0,0 +1,21 @@
+"""
+Keyset pagination cursors for list endpoints
+"""
+import base64
+import json
+from typing import Any, Optional, Tuple
+
+def encode_cursor(timestamp: Any, item_id: Any) -> str:
+    """Encode the (timestamp, id) sort key of the last returned item"""
+    raw = json.dumps([timestamp, item_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, Any]]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return timestamp, item_id
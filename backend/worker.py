@@ -2,10 +2,13 @@
 Celery worker for background document processing
 """
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_shutdown
+from kombu import Exchange, Queue
 import os
 import asyncio
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
 
 from services.document_processor import DocumentProcessor
 from services.search_engine import SearchEngine
@@ -34,6 +37,24 @@ celery_app.conf.update(
     enable_utc=True,
     worker_prefetch_multiplier=1,
     task_acks_late=True,
+    # Long document jobs get their own queue so the periodic cleanup never waits
+    # behind them. Reindexing can always be rerun, so its queue is transient and
+    # its messages aren't persisted by the broker. Run separate pools, e.g.
+    #   celery -A worker worker -Q documents -P threads -c 8 --prefetch-multiplier 1
+    #   celery -A worker worker -Q periodic,reindex -P threads -c 4 --prefetch-multiplier 4
+    # The threads pool keeps one copy of the embedding model per worker and lets
+    # document tasks overlap their I/O on the shared loop.
+    task_queues=(
+        Queue('documents', Exchange('documents'), routing_key='documents'),
+        Queue('periodic', Exchange('periodic'), routing_key='periodic'),
+        Queue('reindex', Exchange('reindex', delivery_mode=1), routing_key='reindex', durable=False),
+    ),
+    task_default_queue='documents',
+    task_routes={
+        'worker.process_document_task': {'queue': 'documents'},
+        'worker.cleanup_old_documents': {'queue': 'periodic'},
+        'worker.reindex_documents': {'queue': 'reindex', 'delivery_mode': 1},
+    },
 )
 
 # Initialize services
@@ -42,6 +63,81 @@ document_processor = DocumentProcessor(settings.documents_path)
 search_engine = SearchEngine(settings.vector_db_path)
 citation_tracker = CitationTracker()
 
+# One event loop per worker process, running on its own thread. Services are
+# initialized on it by the first task, and every task submits its coroutines to
+# it, so with the threads pool concurrent tasks multiplex their I/O on a single
+# loop. Loading the embedding model in worker_process_init instead would outrun
+# the prefork pool's 4s worker_proc_alive_timeout and get children killed.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+async def _initialize_services():
+    """Initialize the shared services"""
+    await asyncio.gather(
+        db_manager.initialize(),
+        document_processor.initialize(),
+        search_engine.initialize()
+    )
+    await citation_tracker.initialize(db_manager)
+
+def _stop_loop(loop: asyncio.AbstractEventLoop, thread: threading.Thread):
+    """Stop a loop running on its thread and close it"""
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """The process's event loop, started with initialized services on first use"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='worker-loop', daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(_initialize_services(), loop).result()
+            except BaseException:
+                _stop_loop(loop, thread)
+                raise
+            _loop, _loop_thread = loop, thread
+    return _loop
+
+async def _index_and_cite(document_data: Dict[str, Any]):
+    """Index a document's chunks and create their citations concurrently
+    
+    Both run to completion before the first failure, if any, is raised, so
+    nothing is left running on the loop.
+    """
+    results = await asyncio.gather(
+        search_engine.index_document(document_data),
+        citation_tracker.create_citations(document_data),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+def _run(coro):
+    """Run a coroutine on the process's event loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Release the services and stop the event loop"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(db_manager.close(), _loop).result()
+        finally:
+            document_processor.close()
+            search_engine.close()
+            _stop_loop(_loop, _loop_thread)
+            _loop = _loop_thread = None
+
 @celery_app.task(bind=True, max_retries=3)
 def process_document_task(self, document_id: str, file_path: str, metadata_dict: Dict[str, Any]):
     """
@@ -50,55 +146,34 @@ def process_document_task(self, document_id: str, file_path: str, metadata_dict:
     try:
         logger.info(f"Starting document processing for {document_id}")
         
-        # Convert metadata dict back to DocumentMetadata object
-        metadata = DocumentMetadata(**metadata_dict)
+        # Convert metadata dict back to DocumentMetadata object. It was validated
+        # when the upload was accepted, so skip re-validating it here
+        metadata = DocumentMetadata.model_construct(**metadata_dict)
         
-        # Run async processing in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Process document
+        document_data = _run(document_processor.process_document(file_path, metadata))
+        
+        # Create vector embeddings and citations; neither depends on the other
+        _run(_index_and_cite(document_data))
+        
+        # Update status to processed
+        _run(db_manager.update_document_status(document_id, "processed"))
+        
+        logger.info(f"Document {document_id} processed successfully")
+        
+        return {
+            "status": "success",
+            "document_id": document_id,
+            "chunks_created": len(document_data['chunks']),
+            "message": "Document processed successfully"
+        }
         
-        try:
-            # Initialize services
-            loop.run_until_complete(db_manager.initialize())
-            loop.run_until_complete(search_engine.initialize())
-            loop.run_until_complete(citation_tracker.initialize(db_manager))
-            
-            # Process document
-            document_data = loop.run_until_complete(
-                document_processor.process_document(file_path, metadata)
-            )
-            
-            # Create vector embeddings
-            loop.run_until_complete(search_engine.index_document(document_data))
-            
-            # Create citations
-            loop.run_until_complete(citation_tracker.create_citations(document_data))
-            
-            # Update status to processed
-            loop.run_until_complete(db_manager.update_document_status(document_id, "processed"))
-            
-            logger.info(f"Document {document_id} processed successfully")
-            
-            return {
-                "status": "success",
-                "document_id": document_id,
-                "chunks_created": len(document_data['chunks']),
-                "message": "Document processed successfully"
-            }
-            
-        finally:
-            loop.close()
-            
     except Exception as exc:
         logger.error(f"Document processing failed for {document_id}: {exc}")
         
         # Update status to failed
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(db_manager.initialize())
-            loop.run_until_complete(db_manager.update_document_status(document_id, "failed"))
-            loop.close()
+            _run(db_manager.update_document_status(document_id, "failed"))
         except Exception as db_exc:
             logger.error(f"Failed to update document status: {db_exc}")
         
@@ -121,20 +196,13 @@ def cleanup_old_documents():
     try:
         logger.info("Starting document cleanup task")
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Make sure the database is initialized for this process
+        _get_loop()
+        
+        # Get documents older than retention period
+        # Implementation depends on your retention policy
+        logger.info("Document cleanup completed")
         
-        try:
-            # Initialize database
-            loop.run_until_complete(db_manager.initialize())
-            
-            # Get documents older than retention period
-            # Implementation depends on your retention policy
-            logger.info("Document cleanup completed")
-            
-        finally:
-            loop.close()
-            
     except Exception as exc:
         logger.error(f"Document cleanup failed: {exc}")
 
@@ -146,35 +214,22 @@ def reindex_documents():
     try:
         logger.info("Starting document reindexing")
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Get all processed documents
+        documents = _run(db_manager.get_documents(status="processed"))
+        
+        logger.info(f"Reindexing {len(documents)} documents")
+        
+        # Reprocess each document
+        for doc in documents:
+            try:
+                # Reindex document
+                # Implementation depends on your reindexing strategy
+                pass
+            except Exception as doc_exc:
+                logger.error(f"Failed to reindex document {doc.id}: {doc_exc}")
+        
+        logger.info("Document reindexing completed")
         
-        try:
-            # Initialize services
-            loop.run_until_complete(db_manager.initialize())
-            loop.run_until_complete(search_engine.initialize())
-            
-            # Get all processed documents
-            documents = loop.run_until_complete(
-                db_manager.get_documents(status="processed")
-            )
-            
-            logger.info(f"Reindexing {len(documents)} documents")
-            
-            # Reprocess each document
-            for doc in documents:
-                try:
-                    # Reindex document
-                    # Implementation depends on your reindexing strategy
-                    pass
-                except Exception as doc_exc:
-                    logger.error(f"Failed to reindex document {doc.id}: {doc_exc}")
-            
-            logger.info("Document reindexing completed")
-            
-        finally:
-            loop.close()
-            
     except Exception as exc:
         logger.error(f"Document reindexing failed: {exc}")
 
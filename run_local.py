@@ -2,11 +2,12 @@
 """
 Simple script to run the knowledge retrieval system locally
 """
+import re
 import subprocess
 import sys
 import time
 import threading
-import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 def run_command(command, cwd=None, name="Service"):
@@ -14,9 +15,7 @@ def run_command(command, cwd=None, name="Service"):
     def target():
         try:
             print(f"🚀 Starting {name}...")
-            if cwd:
-                os.chdir(cwd)
-            subprocess.run(command, shell=True, check=True)
+            subprocess.run(command, shell=True, check=True, cwd=cwd)
         except subprocess.CalledProcessError as e:
             print(f"❌ {name} failed: {e}")
         except KeyboardInterrupt:
@@ -30,23 +29,18 @@ def check_prerequisites():
     """Check if required software is installed"""
     print("🔍 Checking prerequisites...")
     
-    # Check Python
-    try:
-        result = subprocess.run(['python', '--version'], capture_output=True, text=True)
-        version = result.stdout.strip()
-        print(f"✅ {version}")
-        if not any(v in version for v in ['3.11', '3.12', '3.13']):
-            print("⚠️  Python 3.11+ recommended")
-    except FileNotFoundError:
-        print("❌ Python not found! Install from https://python.org")
-        return False
+    # Check Python (the interpreter running this script installs the backend)
+    print(f"✅ Python {sys.version.split()[0]}")
+    if sys.version_info < (3, 11):
+        print("⚠️  Python 3.11+ recommended")
     
     # Check Node.js
     try:
         result = subprocess.run(['node', '--version'], capture_output=True, text=True)
         version = result.stdout.strip()
         print(f"✅ Node.js {version}")
-        if not version.startswith('v18') and not version.startswith('v19') and not version.startswith('v20'):
+        match = re.match(r'v(\d+)', version)
+        if not match or int(match.group(1)) < 18:
             print("⚠️  Node.js 18+ recommended")
     except FileNotFoundError:
         print("❌ Node.js not found! Install from https://nodejs.org")
@@ -54,47 +48,34 @@ def check_prerequisites():
     
     return True
 
+def _install(name, cwd, command):
+    """Run one install command in its component directory"""
+    subprocess.run(command, cwd=cwd, check=True)
+    print(f"✅ {name} dependencies installed")
+
 def setup_dependencies():
     """Install dependencies for all components"""
     print("\n📦 Installing dependencies...")
+    print("🐍 Setting up Python backend, ⚛️  React frontend and 🛠️  Admin dashboard...")
     
-    # Setup backend
-    print("🐍 Setting up Python backend...")
-    os.chdir('backend')
-    try:
-        subprocess.run([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'], check=True)
-        print("✅ Backend dependencies installed")
-    except subprocess.CalledProcessError:
-        print("❌ Failed to install backend dependencies")
-        return False
-    finally:
-        os.chdir('..')
-    
-    # Setup frontend
-    print("⚛️  Setting up React frontend...")
-    os.chdir('frontend')
-    try:
-        subprocess.run(['npm', 'install'], check=True)
-        print("✅ Frontend dependencies installed")
-    except subprocess.CalledProcessError:
-        print("❌ Failed to install frontend dependencies")
-        return False
-    finally:
-        os.chdir('..')
-    
-    # Setup admin dashboard
-    print("🛠️  Setting up Admin dashboard...")
-    os.chdir('admin-dashboard')
-    try:
-        subprocess.run(['npm', 'install'], check=True)
-        print("✅ Admin dashboard dependencies installed")
-    except subprocess.CalledProcessError:
-        print("❌ Failed to install admin dashboard dependencies")
-        return False
-    finally:
-        os.chdir('..')
-    
-    return True
+    # The installs are independent, so run them side by side
+    steps = [
+        ("Backend", 'backend', [sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt']),
+        ("Frontend", 'frontend', ['npm', 'install']),
+        ("Admin dashboard", 'admin-dashboard', ['npm', 'install']),
+    ]
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        futures = {executor.submit(_install, *step): step[0] for step in steps}
+        
+        ok = True
+        for future, name in futures.items():
+            try:
+                future.result()
+            except subprocess.CalledProcessError:
+                print(f"❌ Failed to install {name.lower()} dependencies")
+                ok = False
+    
+    return ok
 
 def create_directories():
     """Create required data directories"""
@@ -161,25 +142,28 @@ def main():
     print("\n⏳ Waiting for services to initialize...")
     time.sleep(10)
     
-    print("\n🎉 System started!")
-    print("📍 Access Points:")
-    print("   👥 Knowledge Interface: http://localhost:3000")
-    print("   ⚙️  Admin Dashboard:    http://localhost:3001") 
-    print("   📚 API Documentation:  http://localhost:8000/docs")
-    print("   🔍 Health Check:       http://localhost:8000/health")
-    print("\n📋 Next Steps:")
-    print("1. Visit Admin Dashboard to upload documents")
-    print("2. Go to Knowledge Interface to test suggestions")
-    print("3. Enter case details and watch AI magic happen!")
-    print("\n🛑 To stop: Press Ctrl+C")
+    # One write for the whole banner instead of a flush per line
+    print("\n".join([
+        "\n🎉 System started!",
+        "📍 Access Points:",
+        "   👥 Knowledge Interface: http://localhost:3000",
+        "   ⚙️  Admin Dashboard:    http://localhost:3001",
+        "   📚 API Documentation:  http://localhost:8000/docs",
+        "   🔍 Health Check:       http://localhost:8000/health",
+        "\n📋 Next Steps:",
+        "1. Visit Admin Dashboard to upload documents",
+        "2. Go to Knowledge Interface to test suggestions",
+        "3. Enter case details and watch AI magic happen!",
+        "\n🛑 To stop: Press Ctrl+C",
+    ]))
     
     try:
-        # Keep main thread alive
+        # Keep main thread alive; sleep stays interruptible by Ctrl+C on every
+        # platform, unlike a bare Event.wait() on Windows
         while True:
-            time.sleep(1)
+            time.sleep(3600)
     except KeyboardInterrupt:
-        print("\n🛑 Stopping services...")
-        print("✅ All services stopped")
+        print("\n🛑 Stopping services...\n✅ All services stopped")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file